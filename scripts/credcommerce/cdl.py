@@ -146,7 +146,6 @@ def build_driver():
     chrome_options.add_argument("--headless=new")
     chrome_options.add_argument("--no-sandbox")
     chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--start-maximized")
     chrome_options.add_argument("--window-size=1920,1080")
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--disable-extensions")
@@ -160,7 +159,6 @@ def build_driver():
     chrome_options.add_argument("--disable-blink-features=AutomationControlled")
     
     # Performance options
-    chrome_options.add_argument("--disable-javascript")  # Disable if not needed
     chrome_options.add_argument("--disable-images")  # Disable images for speed
     
     return webdriver.Chrome(options=chrome_options)
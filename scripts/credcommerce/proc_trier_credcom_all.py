@@ -1,15 +1,17 @@
 import os
-import glob
+import hashlib
 import json
 import time
+import random
 import logging
 import pandas as pd
 import numpy as np
-import re
 import gspread
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from openpyxl import load_workbook
 from google.oauth2.service_account import Credentials
-from googleapiclient.errors import HttpError
 
 # -------------------------------------------------
 # Config logging
@@ -17,33 +19,80 @@ from googleapiclient.errors import HttpError
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
 
+# Colunas do relatório que não são usadas (descartadas já na leitura)
+DROP_COLUMNS = frozenset({
+    'Unnamed: 0', 'Vencto.', 'Unnamed: 3', 'Unnamed: 4',
+    'Atraso', 'Unnamed: 6', 'Unnamed: 7', 'Unnamed: 8',
+    'Unnamed: 10', 'Unnamed: 11', 'Data    Recebe',
+    'Unnamed: 14', 'Unnamed: 15', 'Unnamed: 16', 'Unnamed: 18',
+    'Unnamed: 19', 'Unnamed: 21', 'Unnamed: 22',
+    'Unnamed: 23', '  Vlr. Desc. ', 'Unnamed: 25', 'Unnamed: 26',
+    'Unnamed: 27', 'Unnamed: 28', 'Juros Rec.', 'Unnamed: 30',
+    'Unnamed: 31', 'Unnamed: 32', 'Multa Rec.', 'Unnamed: 34',
+    'Unnamed: 35', 'Unnamed: 36', 'Unnamed: 37', 'Caixa', 'Unnamed: 39',
+    'Fil. Rec.', 'Unnamed: 41', 'Fil.', 'Unnamed: 43', 'Venda',
+    'Unnamed: 45', 'Unnamed: 46', 'Unnamed: 47', 'Cupom', 'Unnamed: 49',
+    'Unnamed: 50', 'Unnamed: 51', 'Unnamed: 52', 'Unnamed: 53',
+    'Dependente', 'Unnamed: 55', 'Unnamed: 56', 'Fatura',
+})
+
+# dtypes of the text columns returned by clean_transfer_file
+TEXT_DTYPES = {"Cliente": "string[pyarrow]", "Data Emissão": "string[pyarrow]", "Parcela": "string[pyarrow]"}
+
+# Parquet cache of cleaned files for local re-runs; off unless CREDCOM_CACHE_DIR is set
+# (CI starts from a clean checkout every time, so it would never get a hit there)
+CACHE_DIR = os.getenv("CREDCOM_CACHE_DIR")
+
+# part of the cache key: editing the cleaning code or upgrading pandas invalidates old entries
+with open(__file__, "rb") as _f:
+    CODE_VERSION = f"{hashlib.blake2b(_f.read(), digest_size=8).hexdigest()}:{pd.__version__}"
+
+
 # -------------------------------------------------
 # File utils
 # -------------------------------------------------
 def get_all_files(directory=".", extensions=("xls", "xlsx")):
     """Return list of all files with given extensions in directory, sorted by modification time (oldest first)."""
-    files = []
-    for ext in extensions:
-        files.extend(glob.glob(os.path.join(directory, f"*.{ext}")))
-    return sorted(files, key=os.path.getmtime) if files else []
+    suffixes = tuple(f".{ext}" for ext in extensions)
+    # one scandir pass; DirEntry caches stat() so the sort doesn't hit the disk again
+    with os.scandir(directory) as it:
+        entries = [e for e in it if e.name.endswith(suffixes) and not e.name.startswith(".")]
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    return [e.path for e in entries]
+
+
+def read_report(file_path: str, usecols=None) -> pd.DataFrame:
+    """Read the TRIER report with read-only openpyxl (xlsx) or xlrd (xls)."""
+    if not file_path.lower().endswith(".xlsx"):
+        return pd.read_excel(file_path, skiprows=9, header=0, usecols=usecols, engine="xlrd")
+
+    # read_only skips the style/cell grid; close the workbook to release the file handle
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        return pd.read_excel(wb, skiprows=9, header=0, usecols=usecols, engine="openpyxl")
+    finally:
+        wb.close()
 
 
 # -------------------------------------------------
 # Google API retry helper
 # -------------------------------------------------
-def retry_api_call(func, retries=3, delay=2):
-    """Retry a Google API call on HTTP 500 errors."""
-    for i in range(retries):
+# Sheets errors worth retrying: quota (429) and transient server errors
+RETRY_STATUS = (429, 500, 502, 503)
+
+
+def with_backoff(fn, tries=6, base=1.0):
+    """Call fn, retrying Sheets quota (429) and 5xx errors with exponential backoff."""
+    for i in range(tries):
         try:
-            return func()
-        except HttpError as error:
-            status = getattr(getattr(error, "resp", None), "status", None)
-            if status == 500:
-                logging.warning(f"APIError 500 encountered. Retrying {i + 1}/{retries}...")
-                time.sleep(delay)
-            else:
+            return fn()
+        except gspread.exceptions.APIError as e:
+            code = getattr(e.response, "status_code", None)
+            if code not in RETRY_STATUS or i == tries - 1:
                 raise
-    raise Exception("Max retries reached.")
+            wait = base * 2 ** i + random.random() * 0.3
+            logging.warning(f"APIError {code}, retrying in {wait:.1f}s ({i + 1}/{tries - 1})")
+            time.sleep(wait)
 
 
 def clean_transfer_file(file_path: str) -> pd.DataFrame:
@@ -53,23 +102,8 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
     """
     logging.info(f"Reading: {os.path.basename(file_path)}")
 
-    # Carregar o arquivo Excel
-    df = pd.read_excel(file_path, skiprows=9, header=0)
-
-    # Limpar colunas desnecessárias
-    df = df.drop(columns=['Unnamed: 0', 'Vencto.', 'Unnamed: 3', 'Unnamed: 4',
-           'Atraso', 'Unnamed: 6', 'Unnamed: 7', 'Unnamed: 8',
-           'Unnamed: 10', 'Unnamed: 11', 'Data    Recebe',
-           'Unnamed: 14', 'Unnamed: 15', 'Unnamed: 16', 'Unnamed: 18',
-           'Unnamed: 19', 'Unnamed: 21', 'Unnamed: 22',
-           'Unnamed: 23', '  Vlr. Desc. ', 'Unnamed: 25', 'Unnamed: 26',
-           'Unnamed: 27', 'Unnamed: 28', 'Juros Rec.', 'Unnamed: 30',
-           'Unnamed: 31', 'Unnamed: 32', 'Multa Rec.', 'Unnamed: 34',
-           'Unnamed: 35', 'Unnamed: 36', 'Unnamed: 37', 'Caixa', 'Unnamed: 39',
-           'Fil. Rec.', 'Unnamed: 41', 'Fil.', 'Unnamed: 43', 'Venda',
-           'Unnamed: 45', 'Unnamed: 46', 'Unnamed: 47', 'Cupom', 'Unnamed: 49',
-           'Unnamed: 50', 'Unnamed: 51', 'Unnamed: 52', 'Unnamed: 53',
-           'Dependente', 'Unnamed: 55', 'Unnamed: 56', 'Fatura'], errors="ignore")
+    # Carregar o arquivo Excel, só com as colunas usadas
+    df = read_report(file_path, usecols=lambda c: c not in DROP_COLUMNS)
 
     # Remover linhas completamente vazias
     df.dropna(how='all', inplace=True)
@@ -78,9 +112,6 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
     df["Descrição"] = df["Descrição"].shift(-1)
     df.dropna(how='all', inplace=True)
 
-    # Formatar data
-    df['Emissão'] = pd.to_datetime(df['Emissão']).dt.strftime('%d/%m/%Y')
-
     # --- TRANSFORMAÇÃO PARA O FORMATO Planilha1 ---
 
     # Identificar a coluna de valor - pode ter nome diferente
@@ -94,32 +125,16 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
         # Se não encontrar, usar a última coluna (que geralmente é a de valor)
         coluna_valor = df.columns[-1]
 
-    # Inicializar colunas vazias para Filial e Cliente como object dtype (string)
-    df['Filial'] = None
-    df['Cliente'] = None
-    df['Filial'] = df['Filial'].astype('object')
-    df['Cliente'] = df['Cliente'].astype('object')
-
-    # Variáveis para armazenar o último Filial e Cliente encontrados
-    current_filial = None
-    current_cliente = None
-
-    # Percorrer o dataframe para preencher Filial e Cliente
-    for idx, row in df.iterrows():
-        # Verificar se a linha contém "Filial:" na coluna A (Unnamed: 1)
-        if pd.notna(row.get('Unnamed: 1', '')) and 'Filial:' in str(row.get('Unnamed: 1', '')):
-            current_filial = row.get('Unnamed: 12', None)  # O valor da filial está na coluna C
-            df.at[idx, 'Filial'] = current_filial
-        
-        # Verificar se a linha contém "Cliente:" na coluna A
-        elif pd.notna(row.get('Unnamed: 1', '')) and 'Cliente:' in str(row.get('Unnamed: 1', '')):
-            current_cliente = row.get('Unnamed: 12', None)  # O valor do cliente está na coluna C
-            df.at[idx, 'Cliente'] = current_cliente
-        
-        # Para linhas de parcelas (onde Unnamed:1 é vazio ou NaN)
-        else:
-            df.at[idx, 'Filial'] = current_filial
-            df.at[idx, 'Cliente'] = current_cliente
+    # Propagar o último Filial e Cliente encontrados para as linhas de parcelas.
+    # O valor de ambos está na coluna C (Unnamed: 12) da linha marcadora; cada
+    # marcadora abre uma seção (cumsum) e o valor dela vale para a seção inteira,
+    # mesmo vazio (uma "Filial:" sem valor não herda a filial anterior).
+    col_a = df['Unnamed: 1'].astype(str)
+    is_fil = col_a.str.contains('Filial:', regex=False, na=False)
+    is_cli = col_a.str.contains('Cliente:', regex=False, na=False) & ~is_fil
+    valor = df['Unnamed: 12']
+    df['Filial'] = valor.where(is_fil).groupby(is_fil.cumsum()).transform('first').mask(is_cli)
+    df['Cliente'] = valor.where(is_cli).groupby(is_cli.cumsum()).transform('first').mask(is_fil)
 
     # Remover linhas que não são parcelas (linhas com "Filial:" e "Cliente:")
     df_parcelas = df[df['Filial'].notna() & df['Cliente'].notna()].copy()
@@ -127,6 +142,9 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
     # Remover as linhas originais de "Filial:" e "Cliente:" que não têm dados de parcela
     df_parcelas = df_parcelas[df_parcelas['Emissão'].notna()]
 
+    # Formatar data (só nas linhas de parcelas, depois do filtro)
+    df_parcelas['Emissão'] = pd.to_datetime(df_parcelas['Emissão'], format='%d/%m/%Y').dt.strftime('%d/%m/%Y')
+
     # Selecionar as colunas disponíveis
     colunas_disponiveis = df_parcelas.columns.tolist()
     colunas_desejadas = ['Filial', 'Emissão', 'Cliente', 'Descrição', coluna_valor]
@@ -155,22 +173,12 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
 
     df_final = df_final.rename(columns=novos_nomes)
 
-    def extrair_numero_filial(texto):
-        if pd.isna(texto) or texto is None:
-            return None
-        # Convert to string if it's not already
-        texto_str = str(texto)
-        match = re.search(r'F(\d+)', texto_str)
-        if match:
-            return int(match.group(1))
-        return None
-
-    # Aplicar à coluna 'Filial' existente
-    df_final['Filial'] = df_final['Filial'].apply(extrair_numero_filial)
+    # Extrair o número da filial (ex.: "F01 - ..." -> 1)
+    df_final['Filial'] = df_final['Filial'].astype("string[pyarrow]").str.extract(r'F(\d+)', expand=False).astype('Int64')
     # Define the desired column order
     colunas_ordenadas = ['Filial', 'Cliente', 'Data Emissão', 'Parcela', 'Valor']         
     # Reorder the DataFrame
-    df_final = df_final[colunas_ordenadas]
+    df_final = df_final[colunas_ordenadas].astype(TEXT_DTYPES)
 
     # Resetar o índice
     df_final.reset_index(drop=True, inplace=True)
@@ -179,26 +187,92 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
     
     return df_final
 
+def load_cleaned_file(file_path: str) -> pd.DataFrame:
+    """clean_transfer_file, memoized on disk (CACHE_DIR) so re-runs skip files already parsed."""
+    if not CACHE_DIR:
+        return clean_transfer_file(file_path)
+
+    st = os.stat(file_path)
+    key = hashlib.blake2b(
+        f"{os.path.abspath(file_path)}:{st.st_mtime_ns}:{st.st_size}:{CODE_VERSION}".encode(), digest_size=16
+    ).hexdigest()
+    cache_path = os.path.join(CACHE_DIR, f"{key}.parquet")
+
+    if os.path.exists(cache_path):
+        logging.info(f"Cached: {os.path.basename(file_path)}")
+        return pd.read_parquet(cache_path)
+
+    df_final = clean_transfer_file(file_path)
+
+    # a cache write failure must not fail the file
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        df_final.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logging.warning(f"Could not cache {os.path.basename(file_path)}: {e}")
+
+    return df_final
+
+
 # -------------------------------------------------
 # Google Sheets update
 # -------------------------------------------------
-def update_worksheet(df: pd.DataFrame, sheet_id: str, worksheet_name: str, client: gspread.Client):
-    sh = client.open_by_key(sheet_id)
+def to_cell(value) -> dict:
+    """CellData for a Python scalar, typed the way a RAW ws.update stores it."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
 
-    try:
-        ws = sh.worksheet(worksheet_name)
-    except gspread.WorksheetNotFound:
-        ws = sh.add_worksheet(title=worksheet_name, rows=1000, cols=max(1, len(df.columns)))
-        logging.info(f"Worksheet '{worksheet_name}' created.")
 
-    # Clear existing data and update with new data
-    ws.clear()
-    ws.update([df.columns.values.tolist()] + df.values.tolist())
+def update_worksheet(df: pd.DataFrame, sheet_id: str, worksheet_name: str, client: gspread.Client):
+    sh = open_spreadsheet(client, sheet_id)
+    ws = get_worksheet(sh, worksheet_name, max(1, len(df.columns)))
+
+    # to_numpy(dtype=object) converts column by column to Python scalars (no common-dtype
+    # upcast, and Int64 Filial comes back as int, not numpy.int64); missing cells -> None
+    rows = [{"values": [to_cell(c) for c in df.columns]}]
+    rows.extend(
+        {"values": [to_cell(v) for v in row]}
+        for row in df.to_numpy(dtype=object, na_value=None).tolist()
+    )
+
+    # One request instead of clear + update: updateCells over the whole sheet writes
+    # the rows and clears every cell past them; the grid is grown first since,
+    # unlike ws.update, updateCells does not add rows
+    requests = [
+        {
+            "updateSheetProperties": {
+                "properties": {
+                    "sheetId": ws.id,
+                    "gridProperties": {
+                        "rowCount": max(ws.row_count, len(rows)),
+                        "columnCount": max(ws.col_count, len(df.columns)),
+                    },
+                },
+                "fields": "gridProperties.rowCount,gridProperties.columnCount",
+            }
+        },
+        {
+            "updateCells": {
+                "range": {"sheetId": ws.id},
+                "rows": rows,
+                "fields": "userEnteredValue",
+            }
+        },
+    ]
+    with_backoff(lambda: sh.batch_update({"requests": requests}))
     logging.info(f"Updated '{worksheet_name}' with {len(df)} rows.")
 
 
-def update_google_sheet(df: pd.DataFrame, sheet_id: str):
-    """Authorize and update the Google Sheet."""
+@lru_cache(maxsize=1)
+def get_gspread_client() -> gspread.Client:
+    """Authorize once per process and reuse the client."""
     logging.info("Loading Google credentials...")
 
     creds_env = os.getenv("GSERVICE_JSON")
@@ -212,9 +286,28 @@ def update_google_sheet(df: pd.DataFrame, sheet_id: str):
     else:
         creds = Credentials.from_service_account_file("notas-transf.json", scopes=scope)
 
-    client = gspread.authorize(creds)
+    return gspread.authorize(creds)
+
 
-    update_worksheet(df, sheet_id, "dados_trier", client)
+@lru_cache(maxsize=None)
+def open_spreadsheet(client: gspread.Client, sheet_id: str) -> gspread.Spreadsheet:
+    return client.open_by_key(sheet_id)
+
+
+@lru_cache(maxsize=None)
+def get_worksheet(sh: gspread.Spreadsheet, worksheet_name: str, cols: int) -> gspread.Worksheet:
+    """Fetch (or create) the worksheet once per process."""
+    try:
+        return sh.worksheet(worksheet_name)
+    except gspread.WorksheetNotFound:
+        ws = sh.add_worksheet(title=worksheet_name, rows=1000, cols=cols)
+        logging.info(f"Worksheet '{worksheet_name}' created.")
+        return ws
+
+
+def update_google_sheet(df: pd.DataFrame, sheet_id: str):
+    """Authorize and update the Google Sheet."""
+    update_worksheet(df, sheet_id, "dados_trier", get_gspread_client())
 
 
 # -------------------------------------------------
@@ -235,14 +328,18 @@ def main():
 
     logging.info(f"Found {len(all_files)} file(s) to process.")
 
+    # Each file is parsed independently, so spread them over worker processes
+    # (Excel parsing is CPU-bound and holds the GIL)
     dfs = []
-    for f in all_files:
-        try:
-            cleaned = clean_transfer_file(f)
-            if len(cleaned) > 0:
-                dfs.append(cleaned)
-        except Exception as e:
-            logging.exception(f"Failed processing {os.path.basename(f)}: {e}")
+    with ProcessPoolExecutor(max_workers=min(8, len(all_files))) as executor:
+        futures = [(f, executor.submit(load_cleaned_file, f)) for f in all_files]
+        for f, future in futures:
+            try:
+                cleaned = future.result()
+                if len(cleaned) > 0:
+                    dfs.append(cleaned)
+            except Exception as e:
+                logging.exception(f"Failed processing {os.path.basename(f)}: {e}")
 
     if not dfs:
         logging.warning("No dataframes produced after cleaning. Nothing to upload.")
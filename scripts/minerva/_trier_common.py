@@ -0,0 +1,170 @@
+import re
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from openpyxl import load_workbook
+
+# -------------------------------------------------
+# Cleaning helpers shared by proc_trier_sg.py and proc_trier_alegrete.py
+# (both read the same TRIER "Contas Receber ou Recebidas" report layout)
+# -------------------------------------------------
+
+# Only the report columns used downstream: the Filial/Cliente marker (1), Cliente/Filial
+# text (12), Valor (18) and CPF (35). 7 is dropped later but still counts for the first
+# dropna(how="all"), so it is kept to preserve the row layout the Valor shift relies on.
+KEEP_COLUMNS = frozenset({"Unnamed: 1", "Unnamed: 7", "Unnamed: 12", "Unnamed: 18", "Unnamed: 35"})
+VALOR_COLUMN = "Unnamed: 18"
+
+RE_NONDIGIT = re.compile(r"\D")
+RE_CPF_FMT = re.compile(r"(\d{3})(\d{3})(\d{3})(\d{2})")
+RE_DOT_DECIMAL = re.compile(r"^\d+(\.\d+)?$")
+RE_VALOR_JUNK = re.compile(r"R\$| |\.")
+# no comma anywhere and at least 4 digits
+RE_CENTAVOS = re.compile(r"^[^,\d]*(?:\d[^,\d]*){4,}$")
+
+# dtypes of the text columns returned by clean_transfer_file
+TEXT_DTYPES = {"Cliente": "string[pyarrow]", "CPF": "string[pyarrow]", "Valor": "string[pyarrow]"}
+
+# lookup tables for the zero-padded thousands groups and centavos
+_GROUP3 = pa.array([f"{i:03d}" for i in range(1000)])
+_CENTS2 = pa.array([f"{i:02d}" for i in range(100)])
+
+
+def read_report(file_path: str, usecols=None) -> pd.DataFrame:
+    """Read the TRIER report with calamine, falling back to read-only openpyxl (xlsx) or xlrd (xls)."""
+    try:
+        from python_calamine import CalamineError
+        return pd.read_excel(file_path, skiprows=9, header=0, usecols=usecols, engine="calamine")
+    except ImportError:
+        pass
+    except (ValueError, CalamineError):
+        # CalamineError (e.g. the HTML-disguised .xls exports) is not a ValueError
+        pass
+
+    if not file_path.lower().endswith(".xlsx"):
+        return pd.read_excel(file_path, skiprows=9, header=0, usecols=usecols, engine="xlrd")
+
+    # read_only skips the style/cell grid; close the workbook to release the file handle
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        return pd.read_excel(wb, skiprows=9, header=0, usecols=usecols, engine="openpyxl")
+    finally:
+        wb.close()
+
+
+def read_report_rows(file_path: str) -> pd.DataFrame:
+    """
+    Read the KEEP_COLUMNS of a report, drop blank rows and move each Valor
+    up to the row above it (the report prints it one line below the client).
+    """
+    df = read_report(file_path, usecols=lambda c: c in KEEP_COLUMNS)
+
+    # positional index, the Valor shift below moves values between adjacent non-empty rows
+    df = df.dropna(how="all", ignore_index=True)
+
+    # ---------- move Unnamed: 18 up 1 row (your code does -1) ----------
+    col = VALOR_COLUMN
+    if col in df.columns:
+        vals = df[col]
+        below = vals.shift(-1)
+        # every value (except the first row's) leaves its row, even if another one moves in
+        moved = vals.notna().to_numpy(copy=True)
+        moved[:1] = False
+        df[col] = below.where(below.notna(), vals).mask(moved)
+
+    return df
+
+
+def to_arrow_str(s: pd.Series) -> pd.Series:
+    """
+    Cast to Arrow-backed strings so the .str pipeline runs on Arrow kernels.
+    Missing cells become "" (what astype(str) + digit stripping used to yield).
+    Arrow kernels only take pattern strings, hence the RE_*.pattern below.
+    """
+    if not (isinstance(s.dtype, pd.StringDtype) and s.dtype.storage == "pyarrow"):
+        s = s.astype("string[pyarrow]")
+    return s.fillna("")
+
+
+def format_cpf(s: pd.Series) -> pd.Series:
+    """CPF: force digits + zfill + format"""
+    return (
+        to_arrow_str(s)
+        .str.replace(RE_NONDIGIT.pattern, "", regex=True)
+        .str.zfill(11)
+        .str.replace(RE_CPF_FMT.pattern, r"\1.\2.\3-\4", regex=True)
+    )
+
+
+def format_ptbr(values) -> pd.arrays.ArrowStringArray:
+    """
+    Vectorized f"{x:,.2f}" with pt-BR separators ("1.234,56"); NaN -> "".
+    Built with Arrow compute kernels, so the result never goes through Python strs.
+    """
+    v = np.asarray(values, dtype="float64")
+    # blank Valor cells are common; only the present ones go through the kernels
+    present = ~np.isnan(v)
+    x = v[present]
+    scaled = x * 100
+    cents = np.rint(scaled).astype(np.int64)
+    # x * 100 is itself rounded, so near a half cent rint can land on the other side of
+    # what f"{x:.2f}" gives (it rounds the exact binary value); redo those few exactly
+    frac = scaled - np.floor(scaled)
+    near_half = np.abs(frac - 0.5) <= 1e-9 * np.maximum(1.0, np.abs(scaled))
+    if near_half.any():
+        cents[near_half] = [int(f"{c:.2f}".replace(".", "")) for c in x[near_half]]
+    negative = np.signbit(x)  # f"{-0.001:.2f}" is "-0.00"
+    reais, centavos = np.divmod(np.abs(cents), 100)
+
+    # zero-padded 3-digit groups joined by "."; leading zeros/dots are stripped after
+    txt = _GROUP3.take(reais % 1000)
+    rest = reais // 1000
+    while rest.any():
+        txt = pc.binary_join_element_wise(_GROUP3.take(rest % 1000), txt, ".")
+        rest //= 1000
+    txt = pc.utf8_ltrim(txt, "0.")
+    txt = pc.if_else(pc.equal(txt, ""), "0", txt)
+
+    out = pc.binary_join_element_wise(txt, _CENTS2.take(centavos), ",")
+    out = pc.if_else(pa.array(negative), pc.binary_join_element_wise("-", out, ""), out)
+    if not present.all():
+        blanks = pc.fill_null(pa.nulls(len(v), pa.string()), "")
+        out = pc.replace_with_mask(blanks, pa.array(present), out)
+    return pd.arrays.ArrowStringArray(out)
+
+
+def format_valor(s: pd.Series) -> pd.arrays.ArrowStringArray:
+    """Valor: try to convert pt-BR "269,09" to float, then format it back as pt-BR text"""
+    if pd.api.types.is_numeric_dtype(s):
+        # Read as numbers already: nothing to parse, go straight to the formatter
+        return format_ptbr(s.to_numpy(dtype="float64", na_value=np.nan))
+
+    raw = to_arrow_str(s).str.strip()
+
+    # looks like plain number with dot decimal (e.g. "207.0", "28.0", "207.28")
+    is_dot_decimal = raw.str.match(RE_DOT_DECIMAL.pattern, na=False)
+
+    # Parse values that are dot-decimals directly (do NOT remove dot)
+    val_dot = pd.to_numeric(raw.where(is_dot_decimal), errors="coerce").astype("float64")
+
+    # For the rest (non dot-decimal), normalize pt-BR thousands/decimal
+    normalized = (
+        raw
+        .str.replace(RE_VALOR_JUNK.pattern, "", regex=True)  # "R$", spaces, thousands dots
+        .str.replace(",", ".", regex=False)                  # decimal comma -> dot
+    )
+    val_other = pd.to_numeric(normalized.where(~is_dot_decimal), errors="coerce").astype("float64")
+
+    # Combine
+    val = val_dot.combine_first(val_other)
+
+    # Centavos heuristic ONLY when:
+    # - no comma
+    # - not dot-decimal
+    # - digits length >= 4  (e.g. "26909" -> 269.09)
+    # the first and last are a single RE_CENTAVOS match
+    is_centavos = (~is_dot_decimal) & raw.str.match(RE_CENTAVOS.pattern, na=False)
+
+    return format_ptbr(np.where(is_centavos, val / 100.0, val))
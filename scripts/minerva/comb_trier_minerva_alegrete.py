@@ -1,6 +1,8 @@
 import re, os, json
+import logging
 import unicodedata
-from datetime import datetime
+from functools import lru_cache
+import numpy as np
 import pandas as pd
 import gspread
 from google.oauth2.service_account import Credentials
@@ -19,6 +21,9 @@ HEADER = ["CPF", "TRIER", "Valor", "MINERVA", "Valor", "STATUS", "Anotações"]
 # tolerância de diferença de valor (para arredondamentos)
 VALUE_TOL = 0.05
 
+# Sheets API rejects requests above ~10MB, keep some headroom
+MAX_PAYLOAD_BYTES = 8_000_000
+
 # Color mapping for STATUS
 COLOR_MAP = {
     "✅ OK": {"red": 0.8, "green": 0.9, "blue": 0.8},  # Light green
@@ -27,14 +32,22 @@ COLOR_MAP = {
     "⚠️ SOMENTE MINERVA": {"red": 0.9, "green": 0.9, "blue": 1.0},  # Light blue
 }
 
+_RE_NONDIGIT = re.compile(r"\D")
+_RE_CPF_FMT = re.compile(r"(\d{3})(\d{3})(\d{3})(\d{2})")
+_BRL_TRANS = str.maketrans({",": ".", ".": ","})
+
 
 # ----------------------------
 # Helpers
 # ----------------------------
+@lru_cache(maxsize=4096)
 def strip_accents(s: str) -> str:
+    if s.isascii():
+        return s
     s = unicodedata.normalize("NFKD", s)
     return "".join(ch for ch in s if not unicodedata.combining(ch))
 
+@lru_cache(maxsize=4096)
 def normalize_colname(x: str) -> str:
     s = str(x).replace("\xa0", " ").strip()
     s = strip_accents(s)
@@ -46,80 +59,90 @@ def normalize_df_columns(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = [normalize_colname(c) for c in df.columns]
     return df
 
-def parse_brl_money(x):
-    if x is None:
-        return None
-
-    if isinstance(x, (int, float)) and not pd.isna(x):
-        return float(x)
-
-    s = str(x).strip()
-    if s == "" or s == "-":
-        return None
-
-    s = s.replace("R$", "").replace(" ", "")
-
-    if "," in s:
-        s2 = s.replace(".", "").replace(",", ".")
-        try:
-            return float(s2)
-        except ValueError:
-            return None
-
-    if re.fullmatch(r"\d+(\.\d+)?", s):
-        try:
-            return float(s)
-        except ValueError:
-            return None
-
-    digits = re.sub(r"\D", "", s)
-    if digits == "":
-        return None
+def parse_brl_money_series(col: pd.Series) -> pd.Series:
+    """
+    Parse a whole column of BRL money values (unparseable values become NaN)
+    """
+    # numbers coming straight from the sheet need no string parsing
+    is_num = col.map(lambda v: isinstance(v, (int, float)))
+    nums = pd.to_numeric(col.where(is_num), errors="coerce").astype(float)
+
+    s = col.astype(str).str.strip()
+    s = s.str.replace("R$", "", regex=False).str.replace(" ", "", regex=False)
+
+    # "1.234,56": comma is the decimal separator, dots group thousands
+    has_comma = s.str.contains(",", regex=False)
+    comma_val = pd.to_numeric(
+        s.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+        errors="coerce",
+    ).astype(float)
+
+    # "1234" / "1234.56": plain number
+    is_plain = s.str.fullmatch(r"\d+(\.\d+)?")
+    plain_val = pd.to_numeric(s.where(is_plain), errors="coerce").astype(float)
+
+    # anything else: keep only the digits, read as cents past 3 digits
+    digits = s.str.replace(_RE_NONDIGIT, "", regex=True)
+    digits_val = pd.to_numeric(digits, errors="coerce").astype(float)
+    cents_val = digits_val.where(digits.str.len() <= 3, digits_val / 100.0)
+
+    out = plain_val.where(is_plain, cents_val)
+    out = comma_val.where(has_comma, out)
+    return nums.where(is_num, out)
+
+def format_brl_series(values: pd.Series, show_difference=None) -> pd.Series:
+    """
+    Format a whole column as BRL currency ("-" for missing values).
+    show_difference is an optional boolean mask of rows to show as a signed
+    difference ("+ R$ 1,00" / "- R$ 1,00", or "R$ 0,00" when zero).
+    """
+    num = pd.to_numeric(values, errors="coerce").astype(float)
 
-    try:
-        n = float(digits)
-    except ValueError:
-        return None
+    def _fmt(col):
+        # "1,234.56" -> "1.234,56" in a single translate pass
+        return col.map("{:,.2f}".format).astype(object).str.translate(_BRL_TRANS)
 
-    if len(digits) <= 3:
-        return n
-    return n / 100.0
-
-def format_brl(v, show_difference=False):
-    if v is None or pd.isna(v):
-        return "-"
-    
-    if show_difference and v != 0:
-        sign = "+" if v > 0 else "-"
-        s = f"{abs(float(v)):,.2f}"
-        s = s.replace(",", "X").replace(".", ",").replace("X", ".")
-        return f"{sign} R$ {s}"
-    elif show_difference and v == 0:
-        return "R$ 0,00"
-    else:
-        s = f"{float(v):,.2f}"
-        s = s.replace(",", "X").replace(".", ",").replace("X", ".")
-        return f"R$ {s}"
+    out = "R$ " + _fmt(num)
+    if show_difference is not None:
+        show_difference = pd.Series(show_difference, index=num.index).astype(bool)
+        sign = pd.Series(np.where(num > 0, "+ ", "- "), index=num.index)
+        diff = (sign + "R$ " + _fmt(num.abs())).where(num != 0, "R$ 0,00")
+        out = diff.where(show_difference, out)
+    return out.where(num.notna(), "-")
 
 def normalize_cpf(x):
+    # fast path: most sheet values are already 11 clean digits
+    if isinstance(x, str) and len(x) == 11 and x.isdecimal():
+        return x
     if x is None:
         return None
-    s = re.sub(r"\D", "", str(x))
+    s = _RE_NONDIGIT.sub("", str(x))
     if s == "":
         return None
     s = s.zfill(11)
     return s if len(s) == 11 else None
 
-def format_cpf(cpf_digits: str) -> str:
-    if not cpf_digits or len(cpf_digits) != 11:
-        return "-"
-    return re.sub(r"(\d{3})(\d{3})(\d{3})(\d{2})", r"\1.\2.\3-\4", cpf_digits)
+def normalize_cpf_series(col: pd.Series) -> pd.Series:
+    """
+    Vectorized normalize_cpf for a whole column (invalid CPFs become NaN)
+    """
+    digits = col.astype(str).str.replace(_RE_NONDIGIT, "", regex=True)
+    return digits.str.zfill(11).where((digits != "") & (digits.str.len() <= 11))
 
 
 # ----------------------------
 # Core: build output rows (one per CPF)
 # ----------------------------
-def build_conferencia_cpf_valor(df_a: pd.DataFrame, df_b: pd.DataFrame) -> list[dict]:
+def sum_by_cpf(df: pd.DataFrame) -> tuple:
+    """
+    Sum Valor_num per CPF: factorize the CPFs into integer codes and add up
+    with np.bincount. Returns (CPFs in first-seen order, totals)
+    """
+    codes, uniques = pd.factorize(df["cpf_norm"])
+    totals = np.bincount(codes, weights=df["Valor_num"].to_numpy(dtype=float), minlength=len(uniques))
+    return uniques, totals
+
+def build_conferencia_cpf_valor(df_a: pd.DataFrame, df_b: pd.DataFrame) -> pd.DataFrame:
     """
     TRIER (A) may have multiple rows per CPF (split by Filial)
     MINERVA (B) has a single total per CPF
@@ -135,111 +158,80 @@ def build_conferencia_cpf_valor(df_a: pd.DataFrame, df_b: pd.DataFrame) -> list[
         if col not in b.columns:
             raise ValueError(f"Coluna '{col}' não encontrada em {SHEET_MINERVA}. Achei: {list(b.columns)}")
 
-    a["cpf_norm"] = a["cpf"].apply(normalize_cpf)
-    b["cpf_norm"] = b["cpf"].apply(normalize_cpf)
+    a["cpf_norm"] = normalize_cpf_series(a["cpf"])
+    b["cpf_norm"] = normalize_cpf_series(b["cpf"])
 
-    a["Valor_num"] = a["valor"].apply(parse_brl_money)
-    b["Valor_num"] = b["valor"].apply(parse_brl_money)
+    a["Valor_num"] = parse_brl_money_series(a["valor"])
+    b["Valor_num"] = parse_brl_money_series(b["valor"])
 
     a = a.dropna(subset=["cpf_norm", "Valor_num"])
     b = b.dropna(subset=["cpf_norm", "Valor_num"])
 
-    # ---- MINERVA: build dict cpf -> total (and client name)
-    b_grp = (
-        b.groupby("cpf_norm", as_index=False)
-         .agg({"Valor_num": "sum", "cliente": "first"})
+    # ---- MINERVA: total (and client name) per CPF
+    cpfs, totals = sum_by_cpf(b)
+    b_grp = pd.DataFrame({"cpf_norm": cpfs, "minerva_val": totals})
+    first_nome = (
+        b.loc[b["cliente"].notna()]
+         .drop_duplicates("cpf_norm")
+         .set_index("cpf_norm")["cliente"]
     )
-    b_map = {row["cpf_norm"]: (float(row["Valor_num"]), str(row["cliente"])) for _, row in b_grp.iterrows()}
+    b_grp["minerva_nome"] = b_grp["cpf_norm"].map(first_nome).astype(str)
 
     # ---- TRIER: group by CPF and sum values
-    a_grp = (
-        a.groupby("cpf_norm", as_index=False)
-         .agg({
-             "Valor_num": "sum",
-             "cliente": lambda x: " / ".join(sorted(set(str(v) for v in x if pd.notna(v))))  # Join multiple client names
-         })
+    cpfs, totals = sum_by_cpf(a)
+    a_grp = pd.DataFrame({"cpf_norm": cpfs, "trier_sum": totals})
+
+    # Join multiple client names - dedupe and sort once for all CPFs
+    # instead of sorted(set(...)) inside every group
+    nomes = (
+        a.loc[a["cliente"].notna(), ["cpf_norm", "cliente"]]
+         .astype(str)
+         .drop_duplicates()
+         .sort_values(["cpf_norm", "cliente"], kind="stable")
+         .groupby("cpf_norm", sort=False)["cliente"]
+         .agg(" / ".join)
+    )
+    a_grp["trier_nome"] = a_grp["cpf_norm"].map(nomes).fillna("")
+
+    # ---- hash-join both sides on CPF
+    m = a_grp.merge(b_grp, on="cpf_norm", how="outer", indicator=True)
+    only_trier = (m["_merge"] == "left_only").to_numpy()
+    only_minerva = (m["_merge"] == "right_only").to_numpy()
+    diff = (m["trier_sum"] - m["minerva_val"]).to_numpy()
+    divergent = ~only_trier & ~only_minerva & (np.abs(diff) > VALUE_TOL)
+
+    status = np.select(
+        [only_trier, only_minerva, divergent],
+        ["⚠️ SOMENTE TRIER", "⚠️ SOMENTE MINERVA", "⚠️ VALOR DIVERGENTE"],
+        default="✅ OK",
     )
-    
-    out = []
-    used_minerva_cpfs = set()
-
-    # Process each CPF from TRIER
-    for _, row in a_grp.iterrows():
-        cpf = row["cpf_norm"]
-        trier_sum = float(row["Valor_num"])
-        trier_nome = row["cliente"]
-        
-        minerva_info = b_map.get(cpf)
-
-        if minerva_info is not None:
-            minerva_total, minerva_cliente = minerva_info
-            used_minerva_cpfs.add(cpf)
-
-            diff = abs(trier_sum - minerva_total)
-            
-            if diff <= VALUE_TOL:
-                # OK case - show the sum
-                status = "✅ OK"
-                trier_val_display = trier_sum
-                trier_nome_display = trier_nome
-            else:
-                # Divergent case - show the difference
-                status = "⚠️ VALOR DIVERGENTE"
-                trier_val_display = trier_sum - minerva_total  # Positive if TRIER has more, negative if less
-                trier_nome_display = trier_nome
-
-            out.append({
-                "cpf_digits": cpf,
-                "trier_nome": trier_nome_display,
-                "trier_val": trier_val_display,
-                "minerva_nome": minerva_cliente,
-                "minerva_val": minerva_total,
-                "status_calc": status,
-                "is_divergent": status == "⚠️ VALOR DIVERGENTE"
-            })
-
-        else:
-            # CPF exists only in TRIER
-            out.append({
-                "cpf_digits": cpf,
-                "trier_nome": trier_nome,
-                "trier_val": trier_sum,
-                "minerva_nome": "-",
-                "minerva_val": None,
-                "status_calc": "⚠️ SOMENTE TRIER",
-                "is_divergent": False
-            })
-
-    # ---- leftover MINERVA-only CPFs
-    for cpf, (minerva_total, minerva_cliente) in b_map.items():
-        if cpf in used_minerva_cpfs:
-            continue
-        out.append({
-            "cpf_digits": cpf,
-            "trier_nome": "-",
-            "trier_val": None,
-            "minerva_nome": minerva_cliente,
-            "minerva_val": minerva_total,
-            "status_calc": "⚠️ SOMENTE MINERVA",
-            "is_divergent": False
-        })
 
-    def sort_key(d):
-        return (format_cpf(d["cpf_digits"]), d["status_calc"])
+    out = pd.DataFrame({
+        "cpf_digits": m["cpf_norm"],
+        "trier_nome": m["trier_nome"].fillna("-"),
+        # Divergent case shows the difference: positive if TRIER has more, negative if less
+        "trier_val": np.where(divergent, diff, m["trier_sum"]),
+        "minerva_nome": m["minerva_nome"].fillna("-"),
+        "minerva_val": m["minerva_val"],
+        "status_calc": status,
+        "is_divergent": divergent,
+    })
 
-    out.sort(key=sort_key)
-    return out
+    # cpf_digits are all 11 digits, so they sort the same as the formatted CPF
+    return out.sort_values(["cpf_digits", "status_calc"], kind="stable").reset_index(drop=True)
 
 
 # ----------------------------
 # Google Sheets I/O with formatting
 # ----------------------------
 def upsert_worksheet(sh, title: str, rows: int = 2000, cols: int = 10):
+    """
+    Returns (worksheet, created) - created is True when the sheet was just added
+    """
     try:
-        ws = sh.worksheet(title)
+        return sh.worksheet(title), False
     except gspread.WorksheetNotFound:
-        ws = sh.add_worksheet(title=title, rows=rows, cols=cols)
-    return ws
+        return sh.add_worksheet(title=title, rows=rows, cols=cols), True
 
 def ensure_sheet_size(ws, min_rows: int, min_cols: int):
     if ws.row_count < min_rows:
@@ -247,11 +239,21 @@ def ensure_sheet_size(ws, min_rows: int, min_cols: int):
     if ws.col_count < min_cols:
         ws.resize(cols=min_cols)
 
-def read_existing_annotations(ws_out) -> dict:
+def values_to_df(values: list) -> pd.DataFrame:
+    """
+    Build a DataFrame from raw sheet values (first row is the header)
+    """
+    if not values:
+        return pd.DataFrame()
+    header, body = values[0], values[1:]
+    width = len(header)
+    # the API trims trailing empty cells, so pad every row back to the header width
+    return pd.DataFrame([(r + [""] * width)[:width] for r in body], columns=header)
+
+def read_existing_annotations(values: list) -> dict:
     """
     Read only the Anotações column, keyed by CPF only
     """
-    values = ws_out.get_all_values()
     if not values:
         return {}
 
@@ -264,7 +266,7 @@ def read_existing_annotations(ws_out) -> dict:
             continue
 
         # Get annotation from column G (index 6)
-        anot = (row[6] or "").strip()
+        anot = str(row[6] or "").strip()
         
         # Store by CPF only
         if cpf_digits not in annotations and anot:
@@ -274,60 +276,77 @@ def read_existing_annotations(ws_out) -> dict:
 
     return annotations
 
-def apply_status_coloring(ws, num_rows: int):
+def status_coloring_requests(ws, statuses: list) -> list:
     """
-    Apply background color to STATUS column based on the status value
+    Builds batch_update requests that color the STATUS column (F) based on
+    the status value. Statuses are the ones just written, starting at row 2,
+    so there's no need to read them back; consecutive equal statuses share
+    one request.
     """
-    try:
-        requests = []
-        
-        # Get all status values to determine coloring
-        status_range = f"F2:F{num_rows}"  # STATUS is now column F
-        status_values = ws.get(status_range)
-        
-        for i, row in enumerate(status_values, start=2):  # start from row 2 (after header)
-            if row and row[0] in COLOR_MAP:
-                color = COLOR_MAP[row[0]]
-                requests.append({
-                    "repeatCell": {
-                        "range": {
-                            "sheetId": ws.id,
-                            "startRowIndex": i - 1,
-                            "endRowIndex": i,
-                            "startColumnIndex": 5,  # Column F (0-based)
-                            "endColumnIndex": 6
-                        },
-                        "cell": {
-                            "userEnteredFormat": {
-                                "backgroundColor": color
-                            }
-                        },
-                        "fields": "userEnteredFormat.backgroundColor"
-                    }
-                })
-        
-        if requests:
-            # Batch update in chunks of 100 to avoid quota issues
-            for i in range(0, len(requests), 100):
-                chunk = requests[i:i + 100]
-                ws.spreadsheet.batch_update({"requests": chunk})
-                
-    except Exception as e:
-        print(f"Note: Could not apply status coloring: {e}")
-
-def write_values_chunked(ws, values, start_cell="A1", chunk_size=500):
+    requests = []
+    start = 0
+    for i in range(1, len(statuses) + 1):
+        if i < len(statuses) and statuses[i] == statuses[start]:
+            continue
+        color = COLOR_MAP.get(statuses[start])
+        if color:
+            requests.append({
+                "repeatCell": {
+                    "range": {
+                        "sheetId": ws.id,
+                        "startRowIndex": start + 1,  # skip header
+                        "endRowIndex": i + 1,
+                        "startColumnIndex": 5,  # Column F (0-based)
+                        "endColumnIndex": 6
+                    },
+                    "cell": {
+                        "userEnteredFormat": {
+                            "backgroundColor": color
+                        }
+                    },
+                    "fields": "userEnteredFormat.backgroundColor"
+                }
+            })
+        start = i
+    return requests
+
+def write_values_chunked(sh, title: str, values, chunk_size=10_000):
+    """
+    Writes values from A1 with values.batchUpdate, packing as many chunks as
+    fit under MAX_PAYLOAD_BYTES into each call (usually a single call)
+    """
+    def flush(data):
+        sh.values_batch_update({"valueInputOption": "RAW", "data": data})
+
+    data, size = [], 0
     for i in range(0, len(values), chunk_size):
         chunk = values[i:i + chunk_size]
-        start_row = 1 + i
-        cell = f"A{start_row}"
-        ws.update(cell, chunk, value_input_option="RAW")
-
-def clear_leftover_rows(ws, start_row: int, end_row: int, end_col_letter: str):
+        chunk_bytes = len(json.dumps(chunk, ensure_ascii=False).encode("utf-8"))
+        if data and size + chunk_bytes > MAX_PAYLOAD_BYTES:
+            flush(data)
+            data, size = [], 0
+        data.append({"range": f"'{title}'!A{1 + i}", "values": chunk})
+        size += chunk_bytes
+    if data:
+        flush(data)
+
+def clear_leftover_rows_request(ws, start_row: int, end_row: int, end_col: int) -> dict:
     """
-    Clears A{start_row}:{end_col}{end_row}
+    Builds a batch_update request that clears rows start_row..end_row (1-based),
+    columns A up to end_col (exclusive, 0-based)
     """
-    if end_row >= start_row:
-        ws.batch_clear([f"A{start_row}:{end_col_letter}{end_row}"])
+    return {
+        "updateCells": {
+            "range": {
+                "sheetId": ws.id,
+                "startRowIndex": start_row - 1,
+                "endRowIndex": end_row,
+                "startColumnIndex": 0,
+                "endColumnIndex": end_col
+            },
+            "fields": "userEnteredValue"
+        }
+    }
 
 def main():
     if not SPREADSHEET_ID:
@@ -342,65 +361,76 @@ def main():
     gc = gspread.authorize(creds)
     sh = gc.open_by_key(SPREADSHEET_ID)
 
-    ws_t = sh.worksheet(SHEET_TRIER)
-    ws_m = sh.worksheet(SHEET_MINERVA)
+    ws_out, created = upsert_worksheet(sh, SHEET_OUT, rows=2000, cols=10)
+
+    # Fetch TRIER, MINERVA and the current output in a single values.batchGet.
+    # Unformatted values skip the server-side locale formatting; numbers come
+    # back as numbers, which parse_brl_money_series passes straight through.
+    value_ranges = sh.values_batch_get(
+        [f"'{SHEET_TRIER}'", f"'{SHEET_MINERVA}'", f"'{SHEET_OUT}'"],
+        params={"valueRenderOption": "UNFORMATTED_VALUE"},
+    )["valueRanges"]
+    values_t, values_m, values_out = (vr.get("values", []) for vr in value_ranges)
 
-    df_t = pd.DataFrame(ws_t.get_all_records())
-    df_m = pd.DataFrame(ws_m.get_all_records())
+    df_t = values_to_df(values_t)
+    df_m = values_to_df(values_m)
 
-    items = build_conferencia_cpf_valor(df_t, df_m)
+    items_df = build_conferencia_cpf_valor(df_t, df_m)
 
-    ws_out = upsert_worksheet(sh, SHEET_OUT, rows=max(2000, len(items) + 5), cols=10)
-    ensure_sheet_size(ws_out, min_rows=max(2000, len(items) + 5), min_cols=7)  # Now 7 columns
+    ensure_sheet_size(ws_out, min_rows=max(2000, len(items_df) + 5), min_cols=7)  # Now 7 columns
 
     # Read only existing annotations
-    annotations = read_existing_annotations(ws_out)
+    annotations = read_existing_annotations(values_out)
 
-    rows = []
-    for d in items:
-        cpf_digits = d["cpf_digits"]
-        
-        # Format TRIER value - show difference for divergent cases
-        is_divergent = d.get("is_divergent", False)
-        trier_val_fmt = format_brl(d["trier_val"], show_difference=is_divergent)
-        
-        minerva_val_fmt = format_brl(d["minerva_val"]) if d["minerva_val"] is not None else "-"
+    # Format each output column in one pass over the items
+
+    # cpf_digits is always 11 normalized digits here
+    cpf_col = items_df["cpf_digits"].str.replace(_RE_CPF_FMT, r"\1.\2.\3-\4", regex=True)
 
-        # Get annotation by CPF only
-        anot = annotations.get(cpf_digits, "")
+    # Format TRIER value - show difference for divergent cases
+    trier_val_col = format_brl_series(items_df["trier_val"], show_difference=items_df["is_divergent"])
+    minerva_val_col = format_brl_series(items_df["minerva_val"])
 
-        # Always use calculated status
-        status_final = d["status_calc"]
+    # Get annotation by CPF only
+    anot_col = items_df["cpf_digits"].map(annotations).fillna("")
 
-        rows.append([
-            format_cpf(cpf_digits),
-            d["trier_nome"],
-            trier_val_fmt,
-            d["minerva_nome"],
-            minerva_val_fmt,
-            status_final,
-            anot  # preserve notes by CPF
-        ])
+    # Always use calculated status
+    rows = [
+        list(r) for r in zip(
+            cpf_col,
+            items_df["trier_nome"],
+            trier_val_col,
+            items_df["minerva_nome"],
+            minerva_val_col,
+            items_df["status_calc"],
+            anot_col,  # preserve notes by CPF
+        )
+    ]
 
     values = [HEADER] + rows
 
     # Write new table
-    write_values_chunked(ws_out, values, chunk_size=500)
+    write_values_chunked(sh, SHEET_OUT, values)
 
-    # Clear leftovers
-    prev_len = len(ws_out.get_all_values())
+    # Rows left over from a longer previous table are cleared on their own call, so a
+    # failure here is not swallowed with the cosmetic requests below.
+    # The output's previous contents were already fetched in the batchGet above
+    prev_len = len(values_out)
     new_len = len(values)
     if prev_len > new_len:
-        clear_leftover_rows(ws_out, start_row=new_len + 1, end_row=prev_len, end_col_letter="G")  # Now up to column G
+        sh.batch_update({"requests": [clear_leftover_rows_request(ws_out, start_row=new_len + 1, end_row=prev_len, end_col=7)]})  # Now up to column G
 
-    # Apply status coloring
-    apply_status_coloring(ws_out, len(rows))
+    # Status coloring and removal of any existing data validation from STATUS
+    # column go out in a single batch_update.
+    # A sheet we just created has no validation.
+    requests = status_coloring_requests(ws_out, items_df["status_calc"].tolist())
 
-    # Remove any existing data validation from STATUS column
-    try:
-        # Clear data validation from column F (index 5)
-        ws_out.clear_basic_filter()
-        requests = [{
+    if not created:
+        try:
+            ws_out.clear_basic_filter()
+        except Exception as e:
+            logging.warning(f"Could not clear basic filter: {e}")
+        requests.append({
             "setDataValidation": {
                 "range": {
                     "sheetId": ws_out.id,
@@ -411,10 +441,13 @@ def main():
                 },
                 "rule": None  # This removes the validation
             }
-        }]
-        sh.batch_update({"requests": requests})
-    except Exception as e:
-        print(f"Note: Could not remove data validation: {e}")
+        })
+
+    if requests:
+        try:
+            sh.batch_update({"requests": requests})
+        except Exception as e:
+            logging.warning(f"Could not apply status coloring: {e}")
 
 if __name__ == "__main__":
     main()
@@ -50,6 +50,9 @@ chrome_options.add_experimental_option("prefs", prefs)
 # initialize webdriver
 driver = webdriver.Chrome(options=chrome_options)
 
+# make sure headless chrome saves downloads straight into download_dir
+driver.execute_cdp_cmd("Page.setDownloadBehavior", {"behavior": "allow", "downloadPath": download_dir})
+
 # start download process 
 try:
     logging.info("Navigate to the target URL and login")
@@ -67,14 +70,12 @@ try:
 
     for tentativa in range(tentativas):
         try:
-            time.sleep(5)
-            campo_empresa = WebDriverWait(driver, 5).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="empresa"]')))
+            campo_empresa = WebDriverWait(driver, 30).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="empresa"]')))
             campo_empresa.clear()
             campo_empresa.send_keys(empresa_nome)
             print(f'{empresa_nome} escrito (tentativa {tentativa+1})')
-            time.sleep(5)
 
-            sugestao = WebDriverWait(driver, 5).until(
+            sugestao = WebDriverWait(driver, 30).until(
                 EC.element_to_be_clickable((By.XPATH, '//*[@id="ngb-typeahead-0-0"]/ngb-highlight/span'))
             )
             sugestao.click()
@@ -109,24 +110,32 @@ try:
         xpath_download = '/html/body/app-root/app-partners/internal-view/div/main/div/div/time-course/div/div/time-course-card[1]/div/div[2]/div/action-button/button/span[1]/i'
         print('Baixando último período normalmente')
 
+    # só conta como download o .xlsx que aparecer depois do clique
+    existing_files = {f for f in os.listdir(download_dir) if f.endswith('.xlsx')}
+
     # Realiza o clique no botão de download apropriado
     WebDriverWait(driver, 5).until(EC.element_to_be_clickable((By.XPATH, xpath_download))).click()
     logging.info('download clicado')
 
-    time.sleep(10)  # Esperar o download completar
+    # Esperar o download completar: chrome grava em .crdownload até terminar
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        files = os.listdir(download_dir)
+        if not any(f.endswith('.crdownload') for f in files) and \
+                any(f.endswith('.xlsx') and f not in existing_files for f in files):
+            break
+        time.sleep(0.5)
     logging.info('download completo')
 
-    # get the most recent downloaded file
-    files = os.listdir(download_dir)
-    downloaded_files = [f for f in files if f.endswith('.xlsx')]
+    # get the most recent downloaded file (scandir caches each entry's stat)
+    with os.scandir(download_dir) as it:
+        downloaded_files = [e for e in it if e.name.endswith('.xlsx')]
     if downloaded_files:
-        # sort files by modifi time
-        downloaded_files.sort(key=lambda x: os.path.getmtime(os.path.join(download_dir, x)))
-        most_recent_file = downloaded_files[-1]  # get the most recent file
-        downloaded_file_path = os.path.join(download_dir, most_recent_file)
+        most_recent_file = max(downloaded_files, key=lambda e: e.stat().st_mtime)
+        downloaded_file_path = most_recent_file.path
 
         # log the final file path and size
-        file_size = os.path.getsize(downloaded_file_path)
+        file_size = most_recent_file.stat().st_size
         logging.info(f"Download completed successfully. File path: {downloaded_file_path}, Size: {file_size} bytes")
     else:
         logging.error("Download failed. No files found.")
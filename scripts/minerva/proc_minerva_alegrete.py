@@ -1,5 +1,4 @@
 import os
-import glob
 import json
 import time
 import logging
@@ -7,7 +6,9 @@ import pandas as pd
 import numpy as np
 import re
 import gspread
+import openpyxl
 
+from concurrent.futures import ProcessPoolExecutor
 from google.oauth2.service_account import Credentials
 from googleapiclient.errors import HttpError
 
@@ -16,16 +17,28 @@ from googleapiclient.errors import HttpError
 # -------------------------------------------------
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
+# Columns of the Minerva export that are never used
+DROP_COLUMNS = {
+    'CNPJ', 'Razão social', 'Matricula', 'Categoria',
+    'Código', 'Descrição', 'Mês',
+    'Ano', 'Data início do período', 'Data fim do período'
+}
+
+RE_NONDIGIT = re.compile(r"\D")
+RE_CPF_FMT = re.compile(r"(\d{3})(\d{3})(\d{3})(\d{2})")
+
 
 # -------------------------------------------------
 # File utils
 # -------------------------------------------------
 def get_all_files(directory=".", extensions=("xls", "xlsx")):
     """Return list of all files with given extensions in directory, sorted by modification time (oldest first)."""
-    files = []
-    for ext in extensions:
-        files.extend(glob.glob(os.path.join(directory, f"*.{ext}")))
-    return sorted(files, key=os.path.getmtime) if files else []
+    suffixes = tuple(f".{ext}" for ext in extensions)
+    # one scandir pass; DirEntry caches stat() so the sort doesn't hit the disk again
+    with os.scandir(directory) as it:
+        entries = [e for e in it if e.name.endswith(suffixes) and not e.name.startswith(".")]
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    return [e.path for e in entries]
 
 
 # -------------------------------------------------
@@ -46,6 +59,43 @@ def retry_api_call(func, retries=3, delay=2):
     raise Exception("Max retries reached.")
 
 
+def cell_text(value):
+    """Text of a cell as read_excel(dtype=str) gives it: integral numbers without ".0", blanks stay None."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def read_xlsx_columns(file_path: str) -> pd.DataFrame:
+    """
+    Stream the first sheet of an .xlsx with openpyxl in read-only mode,
+    keeping only the columns that are not in DROP_COLUMNS
+    """
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return pd.DataFrame()
+
+        keep = [i for i, c in enumerate(header) if c not in DROP_COLUMNS]
+        data = [tuple(r[i] if i < len(r) else None for i in keep) for r in rows]
+    finally:
+        wb.close()
+
+    names = [header[i] for i in keep]
+    df = pd.DataFrame(data, columns=names)
+
+    # same as dtype={"CPF": str} in read_excel, built from the raw cells: once a numeric
+    # CPF column has a blank it is float64, and astype(str) would give "98765432100.0"
+    if "CPF" in df.columns:
+        pos = names.index("CPF")
+        df["CPF"] = pd.Series([cell_text(r[pos]) for r in data], index=df.index, dtype=object)
+    return df
+
+
 def clean_transfer_file(file_path: str) -> pd.DataFrame:
     """
     Load one .xls/.xlsx and produce:
@@ -53,24 +103,22 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
     """
     logging.info(f"Reading: {os.path.basename(file_path)}")
 
-    # Read as-is; force CPF column to string later (name may vary), so keep default here
-    df = pd.read_excel(file_path, header=0, dtype={"CPF": str})
-
-    # Drop unnecessary columns
-    df = df.drop(columns=[
-        'CNPJ', 'Razão social', 'Matricula', 'Categoria',
-        'Código', 'Descrição', 'Mês',
-        'Ano', 'Data início do período', 'Data fim do período'
-    ], errors="ignore")
+    # Unnecessary columns are skipped at read time instead of dropped afterwards
+    if file_path.lower().endswith(".xlsx"):
+        df = read_xlsx_columns(file_path)
+    else:
+        # openpyxl can't stream legacy .xls, let pandas/xlrd handle it
+        df = pd.read_excel(
+            file_path,
+            header=0,
+            dtype={"CPF": str},
+            usecols=lambda c: c not in DROP_COLUMNS,
+        )
 
     # ---- CPF formatting ----
-    df["CPF"] = df["CPF"].str.replace(r"\D", "", regex=True)
+    df["CPF"] = df["CPF"].str.replace(RE_NONDIGIT, "", regex=True)
     df["CPF"] = df["CPF"].str.zfill(11)
-    df["CPF"] = df["CPF"].str.replace(
-        r"(\d{3})(\d{3})(\d{3})(\d{2})",
-        r"\1.\2.\3-\4",
-        regex=True
-    )
+    df["CPF"] = df["CPF"].str.replace(RE_CPF_FMT, r"\1.\2.\3-\4", regex=True)
 
     out = df.rename(columns={
         df.columns[0]: 'Cliente',
@@ -84,6 +132,17 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
 # -------------------------------------------------
 # Google Sheets update
 # -------------------------------------------------
+def to_cell(value) -> dict:
+    """CellData for a Python scalar, typed the way a RAW ws.update stores it."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    return {"userEnteredValue": {"stringValue": str(value)}}
+
+
 def update_worksheet(df: pd.DataFrame, sheet_id: str, worksheet_name: str, client: gspread.Client):
     sh = client.open_by_key(sheet_id)
 
@@ -93,9 +152,38 @@ def update_worksheet(df: pd.DataFrame, sheet_id: str, worksheet_name: str, clien
         ws = sh.add_worksheet(title=worksheet_name, rows=1000, cols=max(1, len(df.columns)))
         logging.info(f"Worksheet '{worksheet_name}' created.")
 
-    # Clear existing data and update with new data
-    ws.clear()
-    ws.update([df.columns.values.tolist()] + df.values.tolist())
+    # itertuples hands back Python scalars row by row, without the 2D object copy of df.values
+    rows = [{"values": [to_cell(c) for c in df.columns]}]
+    rows.extend(
+        {"values": [to_cell(v) for v in row]}
+        for row in df.itertuples(index=False, name=None)
+    )
+
+    # One request instead of clear + update: updateCells over the whole sheet writes
+    # the rows and clears every cell past them; the grid is grown first since,
+    # unlike ws.update, updateCells does not add rows
+    requests = [
+        {
+            "updateSheetProperties": {
+                "properties": {
+                    "sheetId": ws.id,
+                    "gridProperties": {
+                        "rowCount": max(ws.row_count, len(rows)),
+                        "columnCount": max(ws.col_count, len(df.columns)),
+                    },
+                },
+                "fields": "gridProperties.rowCount,gridProperties.columnCount",
+            }
+        },
+        {
+            "updateCells": {
+                "range": {"sheetId": ws.id},
+                "rows": rows,
+                "fields": "userEnteredValue",
+            }
+        },
+    ]
+    sh.batch_update({"requests": requests})
     logging.info(f"Updated '{worksheet_name}' with {len(df)} rows.")
 
 
@@ -137,14 +225,18 @@ def main():
 
     logging.info(f"Found {len(all_files)} file(s) to process.")
 
+    # Each file is parsed independently, so spread them over worker processes
+    # (Excel parsing is CPU-bound and holds the GIL)
     dfs = []
-    for f in all_files:
-        try:
-            cleaned = clean_transfer_file(f)
-            if len(cleaned) > 0:
-                dfs.append(cleaned)
-        except Exception as e:
-            logging.exception(f"Failed processing {os.path.basename(f)}: {e}")
+    with ProcessPoolExecutor(max_workers=min(8, len(all_files))) as executor:
+        futures = [(f, executor.submit(clean_transfer_file, f)) for f in all_files]
+        for f, future in futures:
+            try:
+                cleaned = future.result()
+                if len(cleaned) > 0:
+                    dfs.append(cleaned)
+            except Exception as e:
+                logging.exception(f"Failed processing {os.path.basename(f)}: {e}")
 
     if not dfs:
         logging.warning("No dataframes produced after cleaning. Nothing to upload.")
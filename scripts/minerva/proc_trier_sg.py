@@ -1,5 +1,4 @@
 import os
-import glob
 import json
 import time
 import logging
@@ -8,24 +7,32 @@ import numpy as np
 import re
 import gspread
 
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from google.oauth2.service_account import Credentials
 from googleapiclient.errors import HttpError
 
+from _trier_common import TEXT_DTYPES, format_cpf, format_valor, read_report_rows
+
 # -------------------------------------------------
 # Config logging
 # -------------------------------------------------
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
+RE_FILIAL_NUM = re.compile(r"F0*(\d+)")
+
 
 # -------------------------------------------------
 # File utils
 # -------------------------------------------------
 def get_all_files(directory=".", extensions=("xls", "xlsx")):
     """Return list of all files with given extensions in directory, sorted by modification time (oldest first)."""
-    files = []
-    for ext in extensions:
-        files.extend(glob.glob(os.path.join(directory, f"*.{ext}")))
-    return sorted(files, key=os.path.getmtime) if files else []
+    suffixes = tuple(f".{ext}" for ext in extensions)
+    # one scandir pass; DirEntry caches stat() so the sort doesn't hit the disk again
+    with os.scandir(directory) as it:
+        entries = [e for e in it if e.name.endswith(suffixes) and not e.name.startswith(".")]
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    return [e.path for e in entries]
 
 
 # -------------------------------------------------
@@ -53,39 +60,11 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
     """
     logging.info(f"Reading: {os.path.basename(file_path)}")
 
-    # Read as-is; force CPF column to string later (name may vary), so keep default here
-    df = pd.read_excel(file_path, skiprows=9, header=0)
-
-    df = df.drop(columns=[
-        'Unnamed: 0', 'Vencto.', 'Unnamed: 3', 'Unnamed: 4',
-        'Atraso', 'Unnamed: 6', 'Unnamed: 8',
-        'Unnamed: 10', 'Unnamed: 11', 'Data    Recebe', 'Emissão',
-        'Unnamed: 14', 'Unnamed: 15', 'Unnamed: 16', 'Descrição',
-        'Unnamed: 19', 'Vlr. Rec. c/ ', 'Unnamed: 21', 'Unnamed: 22',
-        'Unnamed: 23', '  Vlr. Desc. ', 'Unnamed: 25', 'Unnamed: 26',
-        'Unnamed: 27', 'Unnamed: 28', 'Juros Rec.', 'Unnamed: 30',
-        'Unnamed: 31', 'Unnamed: 32', 'Multa Rec.', 'Unnamed: 34',
-        'Unnamed: 36', 'Unnamed: 37', 'Caixa', 'Unnamed: 39',
-        'Fil. Rec.', 'Unnamed: 41', 'Fil.', 'Unnamed: 43', 'Venda',
-        'Unnamed: 45', 'Unnamed: 46', 'Unnamed: 47', 'Cupom', 'Unnamed: 49',
-        'Unnamed: 50', 'Unnamed: 51', 'Unnamed: 52', 'Unnamed: 53',
-        'Dependente', 'Unnamed: 55', 'Unnamed: 56', 'Fatura'
-    ], errors="ignore")
-
-    df.dropna(how="all", inplace=True)
-    df = df.reset_index(drop=True)
-
-    # ---------- move Unnamed: 18 up 1 row (your code does -1) ----------
-    col = "Unnamed: 18"
-    if col in df.columns:
-        src = df[col].notna().values
-        src_idx = np.flatnonzero(src)
-        dst_idx = src_idx - 1  # up 1 row
-        valid = dst_idx >= 0
-        df.loc[dst_idx[valid], col] = df.loc[src_idx[valid], col].values
-        df.loc[src_idx[valid], col] = np.nan
+    # Only the needed columns, blank rows dropped and Valor moved up next to its client
+    df = read_report_rows(file_path)
 
     df = df.drop(columns=["Unnamed: 7"], errors="ignore")
+    # rows whose only value was the one shifted up (or in Unnamed: 7) are empty now
     df.dropna(how="all", inplace=True)
 
     marker_col = "Unnamed: 1"   # has Filial: / Cliente:
@@ -94,12 +73,9 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
 
     # Build Filial number from Filial: rows, forward fill
     m = df[marker_col].astype(str).str.strip()
+    text = df[value_col].astype(str)
 
-    filial_num = (
-        df[value_col]
-        .astype(str)
-        .str.extract(r"F0*(\d+)")[0]
-    )
+    filial_num = text.str.extract(RE_FILIAL_NUM)[0]
 
     df["Filial"] = np.where(m.eq("Filial:"), filial_num, np.nan)
     df["Filial"] = df["Filial"].ffill()
@@ -108,17 +84,11 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
     df = df[~m.eq("Filial:")].copy()
 
     # Cliente name is in value_col for client rows
-    df["Cliente"] = df[value_col].astype(str).str.strip()
+    df["Cliente"] = text.str.strip()
 
     # CPF: force digits + zfill + format
     if cpf_col in df.columns:
-        df["CPF"] = (
-            df[cpf_col]
-            .astype(str)
-            .str.replace(r"\D", "", regex=True)
-            .str.zfill(11)
-            .str.replace(r"(\d{3})(\d{3})(\d{3})(\d{2})", r"\1.\2.\3-\4", regex=True)
-        )
+        df["CPF"] = format_cpf(df[cpf_col])
     else:
         df["CPF"] = pd.NA
 
@@ -126,52 +96,15 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
     valor_col = "Unnamed: 18"
 
     if valor_col in df.columns:
-        raw = df[valor_col].astype(str).str.strip()
-    
-        has_comma = raw.str.contains(",", regex=False, na=False)
-    
-        # looks like plain number with dot decimal (e.g. "207.0", "28.0", "207.28")
-        is_dot_decimal = raw.str.match(r"^\d+(\.\d+)?$", na=False)
-    
-        # Parse values that are dot-decimals directly (do NOT remove dot)
-        val_dot = pd.to_numeric(raw.where(is_dot_decimal), errors="coerce").astype("float64")
-    
-        # For the rest (non dot-decimal), normalize pt-BR thousands/decimal
-        normalized = (
-            raw
-            .str.replace("R$", "", regex=False)
-            .str.replace(" ", "", regex=False)
-            .str.replace(".", "", regex=False)   # remove thousands separator
-            .str.replace(",", ".", regex=False)  # decimal comma -> dot
-        )
-        val_other = pd.to_numeric(normalized.where(~is_dot_decimal), errors="coerce").astype("float64")
-    
-        # Combine
-        val = val_dot.combine_first(val_other)
-    
-        # Centavos heuristic ONLY when:
-        # - no comma
-        # - not dot-decimal
-        # - digits length >= 4  (e.g. "26909" -> 269.09)
-        digits_len = raw.str.replace(r"\D", "", regex=True).str.len()
-        is_centavos = (~has_comma) & (~is_dot_decimal) & (digits_len >= 4)
-    
-        val = np.where(is_centavos, val / 100.0, val)
-    
-        df["Valor"] = pd.Series(val, index=df.index)
-    
-        # Format to pt-BR string
-        df["Valor"] = df["Valor"].map(
-            lambda x: f"{x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
-            if pd.notna(x) else ""
-        )
+        df["Valor"] = format_valor(df[valor_col])
     else:
         df["Valor"] = pd.NA
 
     # Filial as Int64
     df["Filial"] = pd.to_numeric(df["Filial"], errors="coerce").astype("Int64")
 
-    out = df[["Filial", "Cliente", "CPF", "Valor"]].dropna(subset=["Cliente"], how="all")
+    # Same dtypes from every file, so the final concat stays on typed (Arrow/Int64) columns
+    out = df[["Filial", "Cliente", "CPF", "Valor"]].astype(TEXT_DTYPES).dropna(subset=["Cliente"], how="all")
 
     logging.info(f"  -> {os.path.basename(file_path)}: {len(out)} clean rows")
     return out
@@ -193,8 +126,23 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
     ws.update([df.columns.values.tolist()] + df.values.tolist())
     logging.info(f"Updated '{worksheet_name}' with {len(df)} rows.")'''
 
+# Contabilidade (R$ #.##0,00;R$ -#.##0,00) applied to the Valor column
+CURRENCY_FORMAT = {"type": "CURRENCY", "pattern": 'R$ #.##0,00;R$ -#.##0,00'}
+
+
+def number_cells(s: pd.Series) -> list:
+    return [
+        {} if np.isnan(v) else {"userEnteredValue": {"numberValue": float(v)}}
+        for v in s.to_numpy(dtype="float64", na_value=np.nan)
+    ]
+
+
+def string_cells(s: pd.Series) -> list:
+    return [{} if pd.isna(v) else {"userEnteredValue": {"stringValue": str(v)}} for v in s]
+
+
 def update_worksheet(df: pd.DataFrame, sheet_id: str, worksheet_name: str, client: gspread.Client):
-    sh = client.open_by_key(sheet_id)
+    sh = open_spreadsheet(client, sheet_id)
 
     try:
         ws = sh.worksheet(worksheet_name)
@@ -202,36 +150,72 @@ def update_worksheet(df: pd.DataFrame, sheet_id: str, worksheet_name: str, clien
         ws = sh.add_worksheet(title=worksheet_name, rows=1000, cols=max(1, len(df.columns)))
         logging.info(f"Worksheet '{worksheet_name}' created.")
 
-    # Clear existing data
-    ws.clear()
-    
-    # Update with values (as numbers)
-    ws.update([df.columns.values.tolist()] + df.values.tolist(), value_input_option="USER_ENTERED")
-    
-    # Apply Contabilidade format to the Valor column (column D, index 4)
-    # Column indices: A=1, B=2, C=3, D=4 (Valor)
+    # Valor comes as pt-BR text ("1.234,56"), which USER_ENTERED used to parse;
+    # updateCells takes typed values, so send the number itself
+    valor = df["Valor"]
+    if not pd.api.types.is_string_dtype(valor):
+        valor = valor.astype(str)
+    valor = pd.to_numeric(
+        valor.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+        errors="coerce",
+    )
+
+    columns = [
+        number_cells(df["Filial"]),
+        string_cells(df["Cliente"]),
+        string_cells(df["CPF"]),
+        number_cells(valor),
+    ]
+    rows = [{"values": [{"userEnteredValue": {"stringValue": c}} for c in df.columns]}]
+    rows.extend({"values": list(cells)} for cells in zip(*columns))
+
+    # One request instead of clear + update + format: updateCells over the whole sheet
+    # writes the values and clears every value past them (formatting is left alone, as
+    # ws.clear did); the grid is grown first since, unlike ws.update, updateCells does
+    # not add rows. The currency format then goes only on the Valor data cells.
+    requests = [
+        {
+            "updateSheetProperties": {
+                "properties": {
+                    "sheetId": ws.id,
+                    "gridProperties": {
+                        "rowCount": max(ws.row_count, len(rows)),
+                        "columnCount": max(ws.col_count, len(df.columns)),
+                    },
+                },
+                "fields": "gridProperties.rowCount,gridProperties.columnCount",
+            }
+        },
+        {
+            "updateCells": {
+                "range": {"sheetId": ws.id},
+                "rows": rows,
+                "fields": "userEnteredValue",
+            }
+        },
+    ]
     if len(df) > 0:
-        # Find the Valor column index (it's the 4th column in your output)
-        valor_col_idx = 4  # Column D
-        
-        # Apply number format to all data rows in the Valor column
-        # Skip header row (row 1)
-        cell_range = f"D2:D{len(df) + 1}"
-        
-        # Format as Contabilidade (R$ #.##0,00;R$ -#.##0,00)
-        ws.format(cell_range, {
-            "numberFormat": {
-                "type": "CURRENCY",
-                "pattern": 'R$ #.##0,00;R$ -#.##0,00'
+        valor_idx = df.columns.get_loc("Valor")
+        requests.append({
+            "repeatCell": {
+                "range": {
+                    "sheetId": ws.id,
+                    "startRowIndex": 1,
+                    "endRowIndex": len(df) + 1,
+                    "startColumnIndex": valor_idx,
+                    "endColumnIndex": valor_idx + 1,
+                },
+                "cell": {"userEnteredFormat": {"numberFormat": CURRENCY_FORMAT}},
+                "fields": "userEnteredFormat.numberFormat",
             }
         })
-        
-        logging.info(f"Applied Contabilidade format to {cell_range}")
-    
+    sh.batch_update({"requests": requests})
+
     logging.info(f"Updated '{worksheet_name}' with {len(df)} rows.")
-    
-def update_google_sheet(df: pd.DataFrame, sheet_id: str):
-    """Authorize and update the Google Sheet."""
+
+@lru_cache(maxsize=1)
+def get_gspread_client() -> gspread.Client:
+    """Authorize once per process and reuse the client."""
     logging.info("Loading Google credentials...")
 
     creds_env = os.getenv("GSERVICE_JSON")
@@ -245,9 +229,17 @@ def update_google_sheet(df: pd.DataFrame, sheet_id: str):
     else:
         creds = Credentials.from_service_account_file("notas-transf.json", scopes=scope)
 
-    client = gspread.authorize(creds)
+    return gspread.authorize(creds)
 
-    update_worksheet(df, sheet_id, "dados_trier_sg", client)
+
+@lru_cache(maxsize=None)
+def open_spreadsheet(client: gspread.Client, sheet_id: str) -> gspread.Spreadsheet:
+    return client.open_by_key(sheet_id)
+
+
+def update_google_sheet(df: pd.DataFrame, sheet_id: str):
+    """Authorize and update the Google Sheet."""
+    update_worksheet(df, sheet_id, "dados_trier_sg", get_gspread_client())
 
 
 # -------------------------------------------------
@@ -268,14 +260,18 @@ def main():
 
     logging.info(f"Found {len(all_files)} file(s) to process.")
 
+    # Each file is parsed independently, so spread them over worker processes
+    # (Excel parsing is CPU-bound and holds the GIL)
     dfs = []
-    for f in all_files:
-        try:
-            cleaned = clean_transfer_file(f)
-            if len(cleaned) > 0:
-                dfs.append(cleaned)
-        except Exception as e:
-            logging.exception(f"Failed processing {os.path.basename(f)}: {e}")
+    with ProcessPoolExecutor(max_workers=min(8, len(all_files))) as executor:
+        futures = [(f, executor.submit(clean_transfer_file, f)) for f in all_files]
+        for f, future in futures:
+            try:
+                cleaned = future.result()
+                if len(cleaned) > 0:
+                    dfs.append(cleaned)
+            except Exception as e:
+                logging.exception(f"Failed processing {os.path.basename(f)}: {e}")
 
     if not dfs:
         logging.warning("No dataframes produced after cleaning. Nothing to upload.")
@@ -35,6 +35,9 @@ chrome_options.add_argument("--disable-dev-shm-usage")
 chrome_options.add_argument("--window-size=1920,1080")  # Set dimensions
 chrome_options.add_argument("--start-maximized")  # Maximize window
 chrome_options.add_argument("--force-device-scale-factor=1")  # Prevent scaling
+chrome_options.add_argument("--blink-settings=imagesEnabled=false")  # no image downloads
+chrome_options.add_argument("--disable-extensions")
+chrome_options.page_load_strategy = "eager"  # return at DOMContentLoaded, the waits gate each step
 
 prefs = {
     "download.default_directory": download_dir,  # set download path
@@ -43,63 +46,68 @@ prefs = {
     "pdfjs.disabled": True,  # Disable built-in PDF viewer
     "download.prompt_for_download": False,  # disable prompt
     "directory_upgrade": True,  # auto-overwrite existing files
-    "safebrowsing.disable_download_protection": True
+    "safebrowsing.disable_download_protection": True,
+    "profile.managed_default_content_settings.images": 2,  # block images
+    "profile.default_content_setting_values.notifications": 2  # block notification prompts
 }
 chrome_options.add_experimental_option("prefs", prefs)
 chrome_options.add_argument("--unsafely-treat-insecure-origin-as-secure=http://drogcidade.ddns.net:4647/sgfpod1/Login.pod")
 
 # initialize webdriver
 driver = webdriver.Chrome(options=chrome_options)
+wait = WebDriverWait(driver, 10)
+long_wait = WebDriverWait(driver, 20)
+short_wait = WebDriverWait(driver, 2, poll_frequency=0.1)
+LOADING = (By.ID, "divLoading")
+
+
+def wait_loading():
+    """Wait for the divLoading overlay raised by the last action to show up, then to go away."""
+    # sem esperar o overlay aparecer, a invisibilidade pode passar antes do AJAX começar
+    try:
+        short_wait.until(EC.visibility_of_element_located(LOADING))
+    except TimeoutException:
+        pass  # já sumiu (ou a ação não chegou a exibir o overlay)
+    wait.until(EC.invisibility_of_element_located(LOADING))
+
 
 # start download process 
 try:
     logging.info("Navigate to the target URL and login")
     driver.get("http://drogcidade.ddns.net:4647/sgfpod1/Login.pod")
 
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="id_cod_usuario"]'))).send_keys(username)
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="nom_senha"]'))).send_keys(password)
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="login"]'))).click()
-    time.sleep(2)
+    wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="id_cod_usuario"]'))).send_keys(username)
+    wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="nom_senha"]'))).send_keys(password)
+    wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="login"]'))).click()
 
-    # button SNGPC
-    time.sleep(2.5)
+    # button SNGPC (the side menu only exists once the post-login page is up)
+    side_menu = wait.until(EC.presence_of_element_located((By.ID, "sideMenuSearch")))
     driver.find_element(By.TAG_NAME, "body").send_keys(Keys.F11)
-    time.sleep(2.5)
     print("Pop-up fechado com sucesso.")
 
     # access "Compras Fornecedores"
-    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "sideMenuSearch")))
-    driver.find_element(By.ID, "sideMenuSearch").send_keys("Contas Receber ou Recebidas")
-    driver.find_element(By.ID, "sideMenuSearch").click()
-    time.sleep(5)
-
-    driver.find_element(By.CSS_SELECTOR, '[title="Contas Receber ou Recebidas"]').click()
-    time.sleep(5)
-  
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="agrup_fil_2"]'))).click()
+    side_menu.send_keys("Contas Receber ou Recebidas")
+    side_menu.click()
+
+    wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, '[title="Contas Receber ou Recebidas"]'))).click()
+    wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="agrup_fil_2"]'))).click()
     print('selecao: agrupar por filial')
-    time.sleep(2)
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="sel_contas_2"]'))).click()
+    wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="sel_contas_2"]'))).click()
     print('selecao: convenio')
-    time.sleep(2)
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="cod_filvendEntrada"]'))).send_keys('14', Keys.ENTER)
-    WebDriverWait(driver, 10).until(EC.invisibility_of_element((By.XPATH, '//*[@id="divLoading"]')))
-    time.sleep(2)
+    wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="cod_filvendEntrada"]'))).send_keys('14', Keys.ENTER)
+    wait_loading()
     print('filial 14 inserida')
     
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="consid_filvend_1"]'))).click()
-    WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.ID, "tabTabdhtmlgoodies_tabView1_1"))).click()
+    wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="consid_filvend_1"]'))).click()
+    long_wait.until(EC.presence_of_element_located((By.ID, "tabTabdhtmlgoodies_tabView1_1"))).click()
     print('dados II')
-    time.sleep(2)
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="cod_empresaEntrada"]'))).send_keys('132', Keys.ENTER)
+    wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="cod_empresaEntrada"]'))).send_keys('132', Keys.ENTER)
+    wait_loading()
     print('empresa convenio: 132 - FORTUNCERES S.A')
-    time.sleep(2)
-    WebDriverWait(driver, 20).until(EC.presence_of_element_located((By.ID, "tabTabdhtmlgoodies_tabView1_2"))).click()
+    long_wait.until(EC.presence_of_element_located((By.ID, "tabTabdhtmlgoodies_tabView1_2"))).click()
     print('dados III')
-    time.sleep(2)
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="selecao_periodo_1"]'))).click()
+    wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="selecao_periodo_1"]'))).click()
     print('periodo por emissao')
-    time.sleep(2)
 
     hoje = datetime.now()
     if hoje.day <= 16:
@@ -110,19 +118,29 @@ try:
         inicio = hoje.replace(day=16)
         fim = proximo_mes.replace(day=15)
 
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="dat_init"]'))).send_keys(inicio.strftime('%d/%m/%Y'))
+    wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="dat_init"]'))).send_keys(inicio.strftime('%d/%m/%Y'))
     print(f'data inicial: {inicio}')
-    time.sleep(2)
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="dat_fim"]'))).send_keys(fim.strftime('%d/%m/%Y'))
+    wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="dat_fim"]'))).send_keys(fim.strftime('%d/%m/%Y'))
     print(f'data final: {fim}')
-    time.sleep(2)
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="saida_4"]'))).click()
+    wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="saida_4"]'))).click()
     print('saida XLS')
-    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//*[@id="runReport"]'))).click()
+
+    # só conta como download o .xls que aparecer depois do clique
+    existing_files = {f for f in os.listdir(download_dir) if f.endswith('.xls')}
+
+    wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="runReport"]'))).click()
     print('gerando relatorio')
-    WebDriverWait(driver, 10).until(EC.invisibility_of_element((By.XPATH, '//*[@id="divLoading"]')))
+    wait_loading()
     print('relatorio gerado')
-    time.sleep(5)  # esperar download
+
+    # Esperar o download completar: chrome grava em .crdownload até terminar
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        files = os.listdir(download_dir)
+        if not any(f.endswith('.crdownload') for f in files) and \
+                any(f.endswith('.xls') and f not in existing_files for f in files):
+            break
+        time.sleep(0.5)
 
     # get the most recent downloaded file
     files = os.listdir(download_dir)
@@ -140,5 +158,4 @@ try:
         logging.error("Download failed. No files found.")
 
 finally:
-    time.sleep(5)
     driver.quit()
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import random
+import logging
+import pandas as pd
+import gspread
+
+from functools import lru_cache
+from google.oauth2.service_account import Credentials
+
+# -------------------------------------------------
+# Google Sheets upload shared by proc_trier.py and proc_bgcard.py
+# (both append the same 7 columns to their sheet)
+# -------------------------------------------------
+
+UPLOAD_COLUMNS = ['DATA', 'CPF', 'CLIENTE', 'FILIAL', 'PARCELA', 'VALOR PARCELA', 'VALOR TOTAL']
+
+# Sheets errors worth retrying: quota (429) and transient server errors
+RETRY_STATUS = (429, 500, 502, 503)
+
+
+def with_backoff(fn, tries=6, base=1.0):
+    """Call fn, retrying Sheets quota (429) and 5xx errors with exponential backoff."""
+    for i in range(tries):
+        try:
+            return fn()
+        except gspread.exceptions.APIError as e:
+            code = getattr(e.response, "status_code", None)
+            if code not in RETRY_STATUS or i == tries - 1:
+                raise
+            wait = base * 2 ** i + random.random() * 0.3
+            logging.warning(f"APIError {code}, retrying in {wait:.1f}s ({i + 1}/{tries - 1})")
+            time.sleep(wait)
+
+
+def format_as_currency(value):
+    """Format a numeric value as Brazilian currency string."""
+    if pd.notnull(value) and value != "":
+        # Convert to float if it's a string
+        if isinstance(value, str):
+            try:
+                # Handle Brazilian format (comma as decimal separator)
+                value = float(value.replace(',', '.'))
+            except ValueError:
+                return value
+
+        # Format as Brazilian currency (R$ with comma as decimal separator)
+        formatted = f"R$ {value:.2f}".replace('.', ',')
+        return formatted
+    return ""
+
+
+@lru_cache(maxsize=1)
+def get_gspread_client() -> gspread.Client:
+    """Authorize once per process and reuse the client."""
+    logging.info("Loading Google credentials...")
+
+    creds_env = os.getenv("GSERVICE_JSON")
+    scope = [
+        "https://www.googleapis.com/auth/spreadsheets",
+        "https://www.googleapis.com/auth/drive",
+    ]
+
+    if creds_env:
+        creds = Credentials.from_service_account_info(json.loads(creds_env), scopes=scope)
+    else:
+        creds = Credentials.from_service_account_file("notas-transf.json", scopes=scope)
+
+    return gspread.authorize(creds)
+
+
+@lru_cache(maxsize=None)
+def open_spreadsheet(client: gspread.Client, sheet_id: str) -> gspread.Spreadsheet:
+    return client.open_by_key(sheet_id)
+
+
+@lru_cache(maxsize=None)
+def get_worksheet(sh: gspread.Spreadsheet, worksheet_name: str, cols: int) -> gspread.Worksheet:
+    """Fetch (or create) the worksheet once per process."""
+    try:
+        return sh.worksheet(worksheet_name)
+    except gspread.WorksheetNotFound:
+        ws = sh.add_worksheet(title=worksheet_name, rows=1000, cols=cols)
+        logging.info(f"Worksheet '{worksheet_name}' created.")
+        return ws
+
+
+def append_dataframe(df: pd.DataFrame, sheet_id: str, worksheet_name: str):
+    """
+    Append the UPLOAD_COLUMNS of df (DATA already formatted as text) to the
+    worksheet, with the two value columns formatted as R$ currency.
+
+    Assumes the data is one contiguous table from A1: the rows go right after
+    the first fully blank row, so a blank row left inside the data (e.g. cleared
+    by hand) gets filled and whatever follows it is overwritten.
+    """
+    sh = open_spreadsheet(get_gspread_client(), sheet_id)
+    ws = get_worksheet(sh, worksheet_name, max(1, len(df.columns)))
+
+    # Apply currency formatting to VALOR PARCELA and VALOR TOTAL
+    # First make a copy to avoid modifying the original
+    df_formatted = df.copy()
+    df_formatted['VALOR PARCELA'] = df_formatted['VALOR PARCELA'].apply(format_as_currency)
+    df_formatted['VALOR TOTAL'] = df_formatted['VALOR TOTAL'].apply(format_as_currency)
+
+    # Monta a lista mantendo os tipos corretos: to_numpy(dtype=object) converte coluna a
+    # coluna para escalares Python (FILIAL continua int); células vazias vão como ""
+    data = df_formatted[UPLOAD_COLUMNS].to_numpy(dtype=object, na_value="").tolist()
+
+    # values.append finds the end of the table server-side: one request, and no
+    # get_all_values download of the whole sheet just to compute the next row.
+    # The table ends at its first blank row (see docstring); col_values(1) can't
+    # stand in for it, DATA is "" whenever the date didn't parse
+    with_backoff(lambda: ws.append_rows(data, value_input_option='USER_ENTERED', insert_data_option='OVERWRITE', table_range='A1'))
+    logging.info(f"Updated '{worksheet_name}' with {len(df)} rows.")
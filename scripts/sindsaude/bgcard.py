@@ -1,9 +1,13 @@
 import os
+import re
 import time
 import logging
 import shutil
-import pandas as pd
+import codecs
+import pyarrow as pa
+import pyarrow.csv as pacsv
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
@@ -37,12 +41,11 @@ chrome_options.add_argument("--headless")
 chrome_options.add_argument("--no-sandbox")
 chrome_options.add_argument("--disable-gpu")
 chrome_options.add_argument("--enable-downloads")  # Explicitly enable downloads
-chrome_options.add_argument("--remote-debugging-port=9222")
 chrome_options.add_argument("--disable-popup-blocking")
 chrome_options.add_argument("--disable-dev-shm-usage")
 chrome_options.add_argument("--window-size=1920,1080")  # Set dimensions
-chrome_options.add_argument("--start-maximized")  # Maximize window
 chrome_options.add_argument("--force-device-scale-factor=1")  # Prevent scaling
+chrome_options.page_load_strategy = "eager"  # return at DOMContentLoaded, the waits gate each step
 
 prefs = {
     "download.default_directory": download_dir,  # set download path
@@ -55,9 +58,6 @@ prefs = {
 }
 chrome_options.add_experimental_option("prefs", prefs)
 
-# initialize webdriver
-driver = webdriver.Chrome(options=chrome_options)
-
 # FILIAIS
 cnpjs = {
     fl1 : '1',
@@ -65,8 +65,12 @@ cnpjs = {
 }
 
 # === FUNÇÕES AUXILIARES ===
+DATA_RE = re.compile(r'(\d{2}/\d{2}/\d{4})')
+ROTULOS_RE = re.compile(r'PARCELA:|TOTAL:|R\$')
+PONTO_VIRGULA = str.maketrans('.', ',')
+
 def limpar_texto(texto):
-    return texto.replace('PARCELA:', '').replace('TOTAL:', '').replace('R$', '').replace('.', ',').strip()
+    return ROTULOS_RE.sub('', texto).translate(PONTO_VIRGULA).strip()
 
 def extrair_dados_cliente(texto):
     partes = texto.split()
@@ -75,97 +79,146 @@ def extrair_dados_cliente(texto):
     nome = " ".join(partes[:-3])
     return nome, cpf, parcela
 
-all_data = []
-     
-for cnpj, num_filial in cnpjs.items():
-        try:
-            logging.info('Acessando o Menu BGCard.')
-            wait = WebDriverWait(driver, 60)
-            driver.get('https://vitrinebage.com.br/BG2024/vendas/')
-
-            logging.info('Realizando login no BGCard.')
-            wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="cartao"]'))).send_keys(bgcard_num)
-            wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="formLogin"]/table/tbody/tr/td/table/tbody/tr[3]/td/center/input'))).click()
-            wait.until(EC.element_to_be_clickable((By.XPATH, '/html/body/div/table[2]/tbody/tr[1]/td[3]/a/img'))).click()
-
-            wait.until(EC.element_to_be_clickable((By.XPATH, '/html/body/center/table[2]/tbody/tr/td[1]/table/tbody/tr[1]/td/form/table/tbody/tr/td/table/tbody/tr[3]/td/center/strong/font/input'))).send_keys(cnpj)
-            wait.until(EC.element_to_be_clickable((By.XPATH, '/html/body/center/table[2]/tbody/tr/td[1]/table/tbody/tr[1]/td/form/table/tbody/tr/td/table/tbody/tr[5]/td/center/input'))).send_keys(bgcard_password)
-            wait.until(EC.element_to_be_clickable((By.XPATH, '/html/body/center/table[2]/tbody/tr/td[1]/table/tbody/tr[1]/td/form/table/tbody/tr/td/table/tbody/tr[6]/td/center/input'))).click()
-
-            wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="senharelatorio"]'))).send_keys(bgcard_password)
-            wait.until(EC.element_to_be_clickable((By.XPATH, '/html/body/table[2]/tbody/tr/td/table/tbody/tr/td/form/label/div/input[2]'))).click()
-
-            driver.switch_to.window(driver.window_handles[-1])
-
-            wait.until(EC.element_to_be_clickable((By.XPATH, '/html/body/table[2]/tbody/tr[1]/td/form/table[2]/tbody/tr/td[5]/a'))).click()
-
-            campo_data_inicio = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="f_date1"]')))
-            campo_data_inicio.send_keys(target_day)
-
-            campo_data_fim = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="f_date2"]')))
-            campo_data_fim.send_keys(target_day)
-
-            wait.until(EC.element_to_be_clickable((By.XPATH, '/html/body/table[2]/tbody/tr[1]/td/form/table[3]/tbody/tr[3]/td[3]/input'))).click()
-
-            try:
-                table_xpath = '//*[@id="table3"]/tbody/tr[3]/td/div/center/table/tbody/tr/td/center/center/table/tbody/tr[2]/td/center/table/tbody/tr/td/center/table/tbody/tr[2]/td/table[1]/tbody/tr[3]/td/table'
-                table = driver.find_element(By.XPATH, table_xpath)
-            except Exception as e:
-                logging.warning(f'Tabela não encontrada para filial {num_filial}: {e}')
-                continue
-
-            rows = table.find_elements(By.TAG_NAME, 'tr')
-            data = []
-
-            for i in range(len(rows)):
-                cols = table.find_elements(By.TAG_NAME, 'tr')[i].find_elements(By.TAG_NAME, 'td')
-                if len(cols) == 8:
-                    try:
-                        cliente_completo = cols[2].text
-                        nome_cliente, cpf_cliente, parcela_cliente = extrair_dados_cliente(cliente_completo)
-                        valor_parcela = limpar_texto(cols[6].text)
-                        valor_total = limpar_texto(cols[7].text)
-
-                        # 🔥 NOVO: Capturar a Data no 6º TD (índice 5)
-                        data_texto = cols[5].text
-                        import re
-                        match = re.search(r'(\d{2}/\d{2}/\d{4})', data_texto)
-                        data_venda = match.group(1) if match else ''
-
-                        data.append([num_filial, nome_cliente.strip(), cpf_cliente.strip(),
-                                        valor_parcela, valor_total, parcela_cliente, data_venda])
-                        
-                        # Adiciona à lista global (TODAS as filiais)
-                        all_data.append([num_filial, nome_cliente.strip(), cpf_cliente.strip(),
-                                        valor_parcela, valor_total, parcela_cliente, data_venda])
-
-                    except Exception as e:
-                        logging.warning(f'Erro ao processar linha na filial {num_filial}: {e}')
-                        continue
-                    
-            logging.info(f"Dados coletados para filial {num_filial}: {len(data)} registros")
+# Texto de todas as células da tabela numa única chamada ao navegador, em vez de
+# uma chamada ao chromedriver por <tr>/<td>/.text; mesmo alcance do find_elements
+# (todos os <tr> e <td> descendentes), com o &nbsp; normalizado como no .text
+TABELA_JS = """
+return Array.from(arguments[0].querySelectorAll('tr'), r =>
+    Array.from(r.querySelectorAll('td'), c => c.innerText.replace(/\\u00a0/g, ' ').trim()));
+"""
+
+COLUNAS = ['Filial', 'Cliente', 'CPF', 'Valor Parcela', 'Valor Total', 'Parcela', 'Data Venda']
+SCHEMA = pa.schema([(coluna, pa.string()) for coluna in COLUNAS])
+
+# === LOCALIZADORES ===
+# Definidos uma vez; campos com id vão por By.ID (getElementById) em vez de XPath
+LOC_CARTAO = (By.ID, 'cartao')
+LOC_ENTRAR = (By.XPATH, '//*[@id="formLogin"]/table/tbody/tr/td/table/tbody/tr[3]/td/center/input')
+LOC_MENU_VENDAS = (By.XPATH, '/html/body/div/table[2]/tbody/tr[1]/td[3]/a/img')
+LOC_CNPJ = (By.XPATH, '/html/body/center/table[2]/tbody/tr/td[1]/table/tbody/tr[1]/td/form/table/tbody/tr/td/table/tbody/tr[3]/td/center/strong/font/input')
+LOC_SENHA = (By.XPATH, '/html/body/center/table[2]/tbody/tr/td[1]/table/tbody/tr[1]/td/form/table/tbody/tr/td/table/tbody/tr[5]/td/center/input')
+LOC_ENTRAR_FILIAL = (By.XPATH, '/html/body/center/table[2]/tbody/tr/td[1]/table/tbody/tr[1]/td/form/table/tbody/tr/td/table/tbody/tr[6]/td/center/input')
+LOC_SENHA_RELATORIO = (By.ID, 'senharelatorio')
+LOC_CONFIRMAR_SENHA = (By.XPATH, '/html/body/table[2]/tbody/tr/td/table/tbody/tr/td/form/label/div/input[2]')
+LOC_RELATORIO = (By.XPATH, '/html/body/table[2]/tbody/tr[1]/td/form/table[2]/tbody/tr/td[5]/a')
+LOC_DATA_INICIO = (By.ID, 'f_date1')
+LOC_DATA_FIM = (By.ID, 'f_date2')
+LOC_PESQUISAR = (By.XPATH, '/html/body/table[2]/tbody/tr[1]/td/form/table[3]/tbody/tr[3]/td[3]/input')
+LOC_TABELA = (By.XPATH, '//*[@id="table3"]/tbody/tr[3]/td/div/center/table/tbody/tr/td/center/center/table/tbody/tr[2]/td/center/table/tbody/tr/td/center/table/tbody/tr[2]/td/table[1]/tbody/tr[3]/td/table')
+
+def coletar_filial(cnpj, num_filial):
+    """Login com o CNPJ da filial num Chrome próprio; devolve as colunas coletadas (uma lista por coluna)."""
+    dados = {coluna: [] for coluna in COLUNAS}
+    driver = webdriver.Chrome(options=chrome_options)
+    try:
+        logging.info('Acessando o Menu BGCard.')
+        # poll de 0.1 s (padrão 0.5 s) em todas as esperas do fluxo
+        wait = WebDriverWait(driver, 60, poll_frequency=0.1)
+        driver.get('https://vitrinebage.com.br/BG2024/vendas/')
+
+        logging.info('Realizando login no BGCard.')
+        wait.until(EC.presence_of_element_located(LOC_CARTAO)).send_keys(bgcard_num)
+        wait.until(EC.element_to_be_clickable(LOC_ENTRAR)).click()
+        wait.until(EC.element_to_be_clickable(LOC_MENU_VENDAS)).click()
+
+        wait.until(EC.presence_of_element_located(LOC_CNPJ)).send_keys(cnpj)
+        wait.until(EC.presence_of_element_located(LOC_SENHA)).send_keys(bgcard_password)
+        wait.until(EC.element_to_be_clickable(LOC_ENTRAR_FILIAL)).click()
+
+        wait.until(EC.presence_of_element_located(LOC_SENHA_RELATORIO)).send_keys(bgcard_password)
+        wait.until(EC.element_to_be_clickable(LOC_CONFIRMAR_SENHA)).click()
+
+        driver.switch_to.window(driver.window_handles[-1])
+
+        wait.until(EC.element_to_be_clickable(LOC_RELATORIO)).click()
+
+        campo_data_inicio = wait.until(EC.presence_of_element_located(LOC_DATA_INICIO))
+        campo_data_inicio.send_keys(target_day)
+
+        campo_data_fim = wait.until(EC.presence_of_element_located(LOC_DATA_FIM))
+        campo_data_fim.send_keys(target_day)
+
+        wait.until(EC.element_to_be_clickable(LOC_PESQUISAR)).click()
 
+        try:
+            # com o carregamento eager o resultado pode ainda estar chegando:
+            # espera curta pela tabela (sem ela a filial não tem vendas no dia)
+            table = WebDriverWait(driver, 15, poll_frequency=0.1).until(EC.presence_of_element_located(LOC_TABELA))
         except Exception as e:
-            logging.error(f'Ocorreu um erro para a filial {cnpj}: {e}')
-            
-if all_data:
-    df = pd.DataFrame(all_data, columns=['Filial', 'Cliente', 'CPF', 
-                                        'Valor Parcela', 'Valor Total', 
-                                        'Parcela', 'Data Venda'])
-    
-    logging.info(f"Total de registros: {len(df)}")
-    
-    # Salvar como CSV
-    filename = f'dados_bgcard.csv'
-    df.to_csv(filename, index=False, encoding='utf-8-sig')
+            logging.warning(f'Tabela não encontrada para filial {num_filial}: {e}')
+            return dados
+
+        registros = 0
+
+        for cols in driver.execute_script(TABELA_JS, table):
+            if len(cols) == 8:
+                try:
+                    cliente_completo = cols[2]
+                    nome_cliente, cpf_cliente, parcela_cliente = extrair_dados_cliente(cliente_completo)
+                    valor_parcela = limpar_texto(cols[6])
+                    valor_total = limpar_texto(cols[7])
+
+                    # 🔥 NOVO: Capturar a Data no 6º TD (índice 5)
+                    data_texto = cols[5]
+                    match = DATA_RE.search(data_texto)
+                    data_venda = match.group(1) if match else ''
+
+                    registro = (num_filial, nome_cliente.strip(), cpf_cliente.strip(),
+                                valor_parcela, valor_total, parcela_cliente, data_venda)
+                    for coluna, valor in zip(COLUNAS, registro):
+                        dados[coluna].append(valor)
+                    registros += 1
+
+                except Exception as e:
+                    logging.warning(f'Erro ao processar linha na filial {num_filial}: {e}')
+                    continue
+
+        logging.info(f"Dados coletados para filial {num_filial}: {registros} registros")
+
+    except Exception as e:
+        logging.error(f'Ocorreu um erro para a filial {cnpj}: {e}')
+
+    finally:
+        driver.quit()
+
+    # o que foi coletado antes de um erro também é devolvido
+    return dados
+
+
+filename = 'dados_bgcard.csv'
+resumo = {}  # filial -> registros gravados
+amostra = None
+
+# Cada filial roda num Chrome próprio, em paralelo (o tempo é quase todo espera
+# de rede no login/relatório). O CSV é gravado filial a filial, na ordem de cnpjs
+# (writer C++ do pyarrow; BOM mantido como no utf-8-sig).
+with ThreadPoolExecutor(max_workers=len(cnpjs)) as executor, open(filename, 'wb') as fh:
+    futures = [(num_filial, executor.submit(coletar_filial, cnpj, num_filial)) for cnpj, num_filial in cnpjs.items()]
+
+    fh.write(codecs.BOM_UTF8)
+    writer = pacsv.CSVWriter(fh, SCHEMA)
+
+    for num_filial, future in futures:
+        dados = future.result()
+        if dados['Filial']:
+            tabela = pa.Table.from_pydict(dados, schema=SCHEMA)
+            writer.write_table(tabela)
+            resumo[num_filial] = resumo.get(num_filial, 0) + tabela.num_rows
+            if amostra is None:
+                amostra = tabela.select(["Valor Parcela", "Valor Total"]).slice(0, 5).to_pandas()
+
+    writer.close()
+
+if resumo:
+    logging.info(f"Total de registros: {sum(resumo.values())}")
     logging.info(f"\n✅ Arquivo salvo: {filename}")
-    print(df[["Valor Parcela", "Valor Total"]].head())
-    
+    print(amostra)
+
     # Estatísticas por filial
     logging.info("\n📊 Resumo por filial:")
-    for filial in df['Filial'].unique():
-        qtd = len(df[df['Filial'] == filial])
+    for filial, qtd in resumo.items():
         logging.info(f"  Filial {filial}: {qtd} registros")
 else:
+    os.remove(filename)
     print("\n❌ Nenhum dado encontrado!")
             
@@ -8,6 +8,8 @@ import numpy as np
 import gspread
 from google.oauth2.service_account import Credentials
 
+from _sheets_common import with_backoff
+
 
 # ----------------------------
 # Config
@@ -36,6 +38,13 @@ HEADER = [
 VALUE_TOL = 0.75   # tolerância para diferença de valores
 DATE_TOL_DAYS = 5  # tolerância de dias para considerar mesma compra
 
+# Regex compiladas uma vez (usadas linha a linha)
+RE_SPACES = re.compile(r"\s+")
+RE_PARCELA = re.compile(r"(\d+)\s*[\/\-]\s*(\d+)")
+RE_NONDIGIT = re.compile(r"\D")
+RE_MOEDA = re.compile(r"[R$\s]")
+RE_CPF_FMT = re.compile(r"(\d{3}\.\d{3}\.\d{3}-\d{2})")
+
 # Color mapping for STATUS
 COLOR_MAP = {
     "✅ OK": {"red": 0.8, "green": 0.9, "blue": 0.8},  # Light green
@@ -70,7 +79,7 @@ def normalize_colname(x):
     s = x.replace("\xa0", " ").strip().lower()
     s = unicodedata.normalize("NFKD", s)
     s = "".join(c for c in s if not unicodedata.combining(c))
-    return re.sub(r"\s+", " ", s).strip()
+    return RE_SPACES.sub(" ", s).strip()
 
 def normalize_df_columns(df):
     """Normalize DataFrame columns and map to expected names."""
@@ -121,7 +130,7 @@ def parse_parcela(x):
     if not x or pd.isna(x) or x == "":
         return (None, None)
 
-    m = re.search(r"(\d+)\s*[\/\-]\s*(\d+)", str(x))
+    m = RE_PARCELA.search(str(x))
     if not m:
         return (None, None)
 
@@ -132,7 +141,7 @@ def clean_cpf(x):
     """Remove non-digits from CPF."""
     if pd.isna(x) or x == "":
         return ""
-    return re.sub(r"\D", "", str(x))
+    return RE_NONDIGIT.sub("", str(x))
 
 
 def safe_float_convert(value):
@@ -149,7 +158,7 @@ def safe_float_convert(value):
         s = str(value).strip()
         
         # Remove currency symbol and thousand separators
-        s = re.sub(r'[R$\s]', '', s)  # Remove R$, spaces
+        s = RE_MOEDA.sub('', s)  # Remove R$, spaces
         s = s.replace('.', '')  # Remove thousand separators
         s = s.replace(',', '.')  # Replace decimal comma with dot
         
@@ -250,7 +259,7 @@ def apply_status_coloring(ws, num_rows: int):
             # Batch update in chunks of 100 to avoid quota issues
             for i in range(0, len(requests), 100):
                 chunk = requests[i:i + 100]
-                ws.spreadsheet.batch_update({"requests": chunk})
+                with_backoff(lambda: ws.spreadsheet.batch_update({"requests": chunk}))
                 
     except Exception as e:
         print(f"Note: Could not apply status coloring: {e}")
@@ -319,7 +328,12 @@ def build_rows(df_trier, df_bg):
             # CPF
             cpf_col = col_map.get('cpf', 'cpf')
             if cpf_col in df.columns:
-                df['cpf'] = df[cpf_col].apply(clean_cpf)
+                # Mesmo resultado de clean_cpf, mas numa única passada vetorizada
+                df['cpf'] = (
+                    df[cpf_col].astype("string")
+                    .str.replace(RE_NONDIGIT, "", regex=True)
+                    .fillna("")
+                )
             else:
                 df['cpf'] = ""
             
@@ -359,9 +373,12 @@ def build_rows(df_trier, df_bg):
             # Cliente
             cliente_col = col_map.get('cliente', 'cliente')
             if cliente_col in df.columns:
-                df['cliente_name'] = df[cliente_col].astype(str).str.strip()
                 # Clean up client name (remove extra spaces, normalize)
-                df['cliente_name'] = df['cliente_name'].apply(lambda x: re.sub(r'\s+', ' ', x).strip())
+                df['cliente_name'] = (
+                    df[cliente_col].astype(str)
+                    .str.replace(RE_SPACES, ' ', regex=True)
+                    .str.strip()
+                )
             else:
                 df['cliente_name'] = ""
             
@@ -539,7 +556,7 @@ def build_rows(df_trier, df_bg):
         filial = row[0]
         # Extract CPF from TRIER or BGCARD name
         name = row[2] if row[2] != "-" else row[5]
-        cpf_match = re.search(r'(\d{3}\.\d{3}\.\d{3}-\d{2})', name)
+        cpf_match = RE_CPF_FMT.search(name)
         cpf = cpf_match.group(1) if cpf_match else ""
         return (filial, cpf)
     
@@ -595,7 +612,7 @@ def main():
             ws_out = sh.worksheet(SHEET_OUT)
             # Read existing annotations before clearing
             annotations = read_existing_annotations(ws_out)
-            ws_out.clear()
+            with_backoff(ws_out.clear)
         except gspread.WorksheetNotFound:
             ws_out = sh.add_worksheet(title=SHEET_OUT, rows=2000, cols=11)
             annotations = {}
@@ -614,7 +631,7 @@ def main():
         values = [HEADER] + rows
         
         # Update using correct parameter order (values first, then range)
-        ws_out.update(values=values, range_name='A1')
+        with_backoff(lambda: ws_out.update(values=values, range_name='A1'))
         
         # Apply status coloring
         if rows:
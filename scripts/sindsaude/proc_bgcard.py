@@ -1,15 +1,12 @@
 import os
-import glob
-import json
-import time
 import logging
 import pandas as pd
 import numpy as np
 import re
-import gspread
-from google.oauth2.service_account import Credentials
 from googleapiclient.errors import HttpError
 
+from _sheets_common import append_dataframe
+
 # -------------------------------------------------
 # Config logging
 # -------------------------------------------------
@@ -20,23 +17,12 @@ logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 # -------------------------------------------------
 def get_all_files(directory=".", extensions=("csv", "xlsx")):
     """Return list of all files with given extensions in directory, sorted by modification time (oldest first)."""
-    files = []
-    for ext in extensions:
-        files.extend(glob.glob(os.path.join(directory, f"*.{ext}")))
-    return sorted(files, key=os.path.getmtime) if files else []
-
-
-def apply_5_percent_discount(value):
-    """Apply 5% discount to a value and round to 2 decimal places."""
-    if pd.notnull(value):
-        # Convert string with comma to float if necessary
-        if isinstance(value, str):
-            value = float(value.replace(',', '.'))
-        # Apply 5% discount (keep 95% of original value)
-        discounted_value = value * 0.95
-        # Round to 2 decimal places
-        return round(discounted_value, 2)
-    return value
+    suffixes = tuple(f".{ext}" for ext in extensions)
+    # one scandir pass; DirEntry caches stat() so the sort doesn't hit the disk again
+    with os.scandir(directory) as it:
+        entries = [e for e in it if e.name.endswith(suffixes) and not e.name.startswith(".")]
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    return [e.path for e in entries]
 
 
 def clean_transfer_file(file_path: str) -> pd.DataFrame:
@@ -44,8 +30,10 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
     
     # Determine file type by extension
     if file_path.endswith('.csv'):
-        # Read CSV file with comma separator
-        df = pd.read_csv(file_path, sep=',', decimal=',', thousands='.')
+        # Read CSV file with comma separator; the C parser turns the money columns
+        # ("1.234,56") straight into floats
+        df = pd.read_csv(file_path, sep=',', decimal=',', thousands='.',
+                         dtype={'Valor Parcela': float, 'Valor Total': float})
         
         # Rename columns to match expected format
         column_mapping = {
@@ -63,16 +51,16 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
         if 'PARCELA' in df.columns:
             df['PARCELA'] = df['PARCELA'].astype(str)
         
-        # Convert DATA to datetime and then to required format
+        # DATA already comes as dd/mm/yyyy from the scraper: parse once only to
+        # validate it and keep the original text (invalid dates become "")
         if 'DATA' in df.columns:
-            df['DATA'] = pd.to_datetime(df['DATA'], format='%d/%m/%Y', errors='coerce')
-        
-        # Apply 5% discount to VALOR PARCELA and VALOR TOTAL
-        if 'VALOR PARCELA' in df.columns:
-            df['VALOR PARCELA'] = df['VALOR PARCELA'].apply(apply_5_percent_discount)
+            datas = pd.to_datetime(df['DATA'], format='%d/%m/%Y', errors='coerce', cache=True)
+            df['DATA'] = df['DATA'].where(datas.notna(), "")
         
-        if 'VALOR TOTAL' in df.columns:
-            df['VALOR TOTAL'] = df['VALOR TOTAL'].apply(apply_5_percent_discount)
+        # Apply 5% discount (keep 95% of the original value), rounded to 2 decimals
+        for col in ('VALOR PARCELA', 'VALOR TOTAL'):
+            if col in df.columns:
+                df[col] = df[col].mul(0.95).round(2)
         
         # Reorder columns to match expected structure
         expected_columns = ['DATA', 'CPF', 'CLIENTE', 'FILIAL', 'PARCELA', 'VALOR PARCELA', 'VALOR TOTAL']
@@ -84,82 +72,12 @@ def clean_transfer_file(file_path: str) -> pd.DataFrame:
     return df
 
 
-def format_as_currency(value):
-    """Format a numeric value as Brazilian currency string."""
-    if pd.notnull(value) and value != "":
-        # Convert to float if it's a string
-        if isinstance(value, str):
-            try:
-                value = float(value.replace(',', '.'))
-            except ValueError:
-                return value
-        
-        # Format as Brazilian currency (R$ with comma as decimal separator)
-        # Using replace to change decimal point to comma
-        formatted = f"R$ {value:.2f}".replace('.', ',')
-        return formatted
-    return ""
-
-
 # -------------------------------------------------
 # Google Sheets update
 # -------------------------------------------------
-def update_worksheet(df: pd.DataFrame, sheet_id: str, worksheet_name: str, client: gspread.Client):
-    sh = client.open_by_key(sheet_id)
-
-    try:
-        ws = sh.worksheet(worksheet_name)
-    except gspread.WorksheetNotFound:
-        ws = sh.add_worksheet(title=worksheet_name, rows=1000, cols=max(1, len(df.columns)))
-        logging.info(f"Worksheet '{worksheet_name}' created.")
-
-    existing_values = ws.get_all_values()
-    next_row = len(existing_values) + 1
-
-    # Converte DATA para datetime garantindo que são objetos de data
-    df['DATA'] = pd.to_datetime(df['DATA'], errors='coerce', dayfirst=True)
-    df['DATA'] = df['DATA'].apply(lambda x: x.strftime('%d/%m/%Y') if pd.notnull(x) else "")
-
-    # Apply currency formatting to VALOR PARCELA and VALOR TOTAL
-    # First make a copy to avoid modifying the original
-    df_formatted = df.copy()
-    df_formatted['VALOR PARCELA'] = df_formatted['VALOR PARCELA'].apply(format_as_currency)
-    df_formatted['VALOR TOTAL'] = df_formatted['VALOR TOTAL'].apply(format_as_currency)
-
-    # Monta a lista mantendo os tipos corretos
-    data = []
-    for row in df_formatted.to_dict('records'):
-        data.append([
-            row['DATA'],
-            row['CPF'],
-            row['CLIENTE'],
-            row['FILIAL'] if row['FILIAL'] is not None else "",
-            row['PARCELA'],
-            row['VALOR PARCELA'],
-            row['VALOR TOTAL']
-        ])
-
-    ws.update(f'A{next_row}', data, value_input_option='USER_ENTERED')
-    logging.info(f"Updated '{worksheet_name}' with {len(df)} rows.")
-
 def update_google_sheet(df: pd.DataFrame, sheet_id: str):
     """Authorize and update the Google Sheet."""
-    logging.info("Loading Google credentials...")
-
-    creds_env = os.getenv("GSERVICE_JSON")
-    scope = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ]
-
-    if creds_env:
-        creds = Credentials.from_service_account_info(json.loads(creds_env), scopes=scope)
-    else:
-        creds = Credentials.from_service_account_file("notas-transf.json", scopes=scope)
-
-    client = gspread.authorize(creds)
-
-    update_worksheet(df, sheet_id, "dados_bgcard", client)
+    append_dataframe(df, sheet_id, "dados_bgcard")
 
 
 # -------------------------------------------------
@@ -1,31 +1,36 @@
 import os
-import glob
-import json
 import time
 import logging
 import pandas as pd
 import numpy as np
 import re
-import gspread
 
-from google.oauth2.service_account import Credentials
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from googleapiclient.errors import HttpError
 
+from _sheets_common import append_dataframe
+
 # -------------------------------------------------
 # Config logging
 # -------------------------------------------------
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
+# rótulo removido da célula de parcela: "PARCELA 1/3" -> "1/3"
+RE_PARCELA = re.compile("PARCELA")
+
 
 # -------------------------------------------------
 # File utils
 # -------------------------------------------------
 def get_all_files(directory=".", extensions=("xls", "xlsx")):
     """Return list of all files with given extensions in directory, sorted by modification time (oldest first)."""
-    files = []
-    for ext in extensions:
-        files.extend(glob.glob(os.path.join(directory, f"*.{ext}")))
-    return sorted(files, key=os.path.getmtime) if files else []
+    suffixes = tuple(f".{ext}" for ext in extensions)
+    # one scandir pass; DirEntry caches stat() so the sort doesn't hit the disk again
+    with os.scandir(directory) as it:
+        entries = [e for e in it if e.name.endswith(suffixes) and not e.name.startswith(".")]
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    return [e.path for e in entries]
 
 
 # -------------------------------------------------
@@ -46,194 +51,151 @@ def retry_api_call(func, retries=3, delay=2):
     raise Exception("Max retries reached.")
 
 
-def format_as_currency(value):
-    """Format a numeric value as Brazilian currency string."""
-    if pd.notnull(value) and value != "":
-        # Convert to float if it's a string
-        if isinstance(value, str):
-            try:
-                # Handle Brazilian format (comma as decimal separator)
-                value = float(value.replace(',', '.'))
-            except ValueError:
-                return value
-        
-        # Format as Brazilian currency (R$ with comma as decimal separator)
-        formatted = f"R$ {value:.2f}".replace('.', ',')
-        return formatted
-    return ""
+@lru_cache(maxsize=256)
+def total_parcelas(parcela_num):
+    """Number of installments in a "x/y" parcela (1 when there is none); cached, most rows repeat a few values."""
+    if parcela_num and "/" in parcela_num:
+        return int(parcela_num.split("/")[1])
+    return 1
+
+
+def read_report(file_path: str) -> pd.DataFrame:
+    """Read the raw report grid with calamine, falling back to the default engine (openpyxl/xlrd)."""
+    try:
+        from python_calamine import CalamineError
+        return pd.read_excel(file_path, header=None, engine="calamine")
+    except ImportError:
+        pass
+    except (ValueError, CalamineError):
+        # CalamineError (e.g. the HTML-disguised .xls exports) is not a ValueError
+        pass
+    return pd.read_excel(file_path, header=None)
 
 
 def clean_transfer_file(file_path: str) -> pd.DataFrame:
     logging.info(f"Reading: {os.path.basename(file_path)}")
 
     # Carregar o arquivo Excel
-    df = pd.read_excel(file_path, header=None)
-
-    dados = []
+    df = read_report(file_path)
+
+    # Matriz crua das células: os rótulos são localizados coluna a coluna com o
+    # .str do pandas (sem copiar a grade para um array de largura fixa) e só as
+    # linhas/colunas encontradas são visitadas em Python. Colunas numéricas ou de
+    # data não têm rótulos e ficam de fora da conversão para texto.
+    arr = df.to_numpy(dtype=object)
+    n_rows, n_cols = arr.shape
+    texto = df.apply(lambda c: c if c.dtype.kind in "biufmM" else c.astype(str).str.strip())
+    e_filial = texto.eq("Filial:").to_numpy()
+    linhas, colunas = np.nonzero(e_filial | texto.eq("Cliente:").to_numpy())
+    # máscara de células vazias calculada de uma vez (sem pd.isna célula a célula)
+    vazio = pd.isna(arr)
+
+    # Uma lista por coluna do resultado (sem um dict por parcela)
+    datas, cpfs, clientes, filiais, parcelas, valores_parcela, valores_total = [], [], [], [], [], [], []
     filial_atual = None
     cliente_atual = None
     cpf_atual = None
 
-    # 🔍 Itera sobre as linhas do DataFrame
-    for idx, row in df.iterrows():
-        for col_idx, value in row.items():
-            # ✅ Quando encontra "Filial:", salva como filial_atual
-            if str(value).strip() == "Filial:":
-                colunas = df.columns.tolist()
-                pos = colunas.index(col_idx)
-                if pos + 11 < len(row):
-                    filial_texto = str(row.iloc[pos + 11])
-                    if filial_texto.startswith("F"):
-                        filial_atual = filial_texto.split()[0]  # Pega F01, F02 etc.
-                        filial_atual = filial_atual.replace("F", "")  # Remove o 'F'
-                        filial_atual = str(int(filial_atual))  # Remove zero à esquerda
-                    else:
-                        filial_atual = ""
-                    print(f"[DEBUG] Linha {idx} → Filial encontrada: {filial_atual}")
-                continue
-
-            # ✅ Quando encontra "Cliente:", salva cliente e cpf
-            if str(value).strip() == "Cliente:":
-                colunas = df.columns.tolist()
-                pos = colunas.index(col_idx)
-
-                if pos + 11 < len(row):
-                    cliente_atual = row.iloc[pos + 11]
-                if pos + 34 < len(row):
-                    cpf_atual = row.iloc[pos + 34]
-
-                # 🔍 A partir do CLIENTE, buscar parcelas
-                linha_parcela = idx + 1
-                while linha_parcela < len(df):
-                    celula_valor = df.iloc[linha_parcela, pos + 19]
-
-                    if pd.isna(celula_valor):
-                        prox_linha = linha_parcela + 1
-                        if prox_linha < len(df) and pd.isna(df.iloc[prox_linha, pos + 8]):
-                            break  # duas linhas vazias = acabou parcelas
-                        else:
-                            linha_parcela += 1
-                            continue
-
-                    valor_parcela = float(celula_valor)
-
-                    # 📅 Captura a DATA (11 colunas à esquerda da célula do valor)
-                    col_data = (pos + 19) - 11
-                    if col_data >= 0:
-                        data_bruta = df.iloc[linha_parcela, col_data]
-                        try:
-                            data_formatada = pd.to_datetime(data_bruta).strftime('%d/%m/%Y')
-                        except:
-                            data_formatada = str(data_bruta)
-                    else:
-                        data_formatada = ""
-
-                    # ✅ Pegar PARCELA (3 células à esquerda e 1 para baixo do valor)
-                    if (pos + 19 - 3) >= 0 and (linha_parcela + 1) < len(df):
-                        celula_parcela = df.iloc[linha_parcela + 1, pos + 16]
-                        if isinstance(celula_parcela, str) and "PARCELA" in celula_parcela:
-                            parcela_num = celula_parcela.replace("PARCELA", "").strip()
-                        else:
-                            parcela_num = None
-                    else:
-                        parcela_num = None
-
-                    # ✅ Calcula VALOR TOTAL com arredondamento
-                    if parcela_num and "/" in parcela_num:
-                        total_parcelas = int(parcela_num.split("/")[1])
-                        valor_total = round(valor_parcela * total_parcelas, 2)
-                    else:
-                        valor_total = round(valor_parcela, 2)
-
-                    filial_formatada = filial_atual
-                    dados.append({
-                        "DATA": pd.to_datetime(data_formatada, dayfirst=True, errors='coerce'),
-                        "CPF": str(cpf_atual).strip() if cpf_atual else "",
-                        "CLIENTE": str(cliente_atual) if cliente_atual else "",
-                        "FILIAL": int(filial_formatada) if filial_formatada and filial_formatada.isdigit() else None,
-                        "PARCELA": str(parcela_num) if parcela_num else "",
-                        "VALOR PARCELA": round(float(valor_parcela), 2),
-                        "VALOR TOTAL": round(float(valor_total), 2)
-                    })
-
-                    linha_parcela += 2  # pula para próxima parcela
-
-    # ✅ Monta DataFrame final e ordena por DATA (desc) e CLIENTE (asc)
-    df_result = pd.DataFrame(dados)
+    # 🔍 Percorre os rótulos na ordem da planilha (linha a linha, da esquerda p/ direita)
+    for idx, pos in zip(linhas.tolist(), colunas.tolist()):
+        # ✅ Quando encontra "Filial:", salva como filial_atual
+        if e_filial[idx, pos]:
+            if pos + 11 < n_cols:
+                filial_texto = str(arr[idx, pos + 11])
+                if filial_texto.startswith("F"):
+                    filial_atual = filial_texto.split()[0]  # Pega F01, F02 etc.
+                    filial_atual = filial_atual.replace("F", "")  # Remove o 'F'
+                    filial_atual = str(int(filial_atual))  # Remove zero à esquerda
+                else:
+                    filial_atual = ""
+                logging.debug("Linha %d → Filial encontrada: %s", idx, filial_atual)
+            continue
+
+        # ✅ Quando encontra "Cliente:", salva cliente e cpf
+        if pos + 11 < n_cols:
+            cliente_atual = arr[idx, pos + 11]
+        if pos + 34 < n_cols:
+            cpf_atual = arr[idx, pos + 34]
+
+        # 🔍 A partir do CLIENTE, buscar parcelas
+        linha_parcela = idx + 1
+        while linha_parcela < n_rows:
+            if vazio[linha_parcela, pos + 19]:
+                prox_linha = linha_parcela + 1
+                if prox_linha < n_rows and vazio[prox_linha, pos + 8]:
+                    break  # duas linhas vazias = acabou parcelas
+                else:
+                    linha_parcela += 1
+                    continue
+
+            valor_parcela = float(arr[linha_parcela, pos + 19])
+
+            # 📅 Captura a DATA (11 colunas à esquerda da célula do valor); guarda o
+            # valor cru, a conversão é feita de uma vez só no DataFrame final
+            col_data = (pos + 19) - 11
+            data_bruta = arr[linha_parcela, col_data] if col_data >= 0 else None
+
+            # ✅ Pegar PARCELA (3 células à esquerda e 1 para baixo do valor)
+            if (pos + 19 - 3) >= 0 and (linha_parcela + 1) < n_rows:
+                celula_parcela = arr[linha_parcela + 1, pos + 16]
+                if isinstance(celula_parcela, str) and "PARCELA" in celula_parcela:
+                    parcela_num = RE_PARCELA.sub("", celula_parcela).strip()
+                else:
+                    parcela_num = None
+            else:
+                parcela_num = None
 
-    # Converter a coluna DATA para datetime para ordenar corretamente
-    df_result['DATA'] = pd.to_datetime(df_result['DATA'], format='%d/%m/%Y', errors='coerce')
+            # ✅ Calcula VALOR TOTAL com arredondamento
+            valor_total = round(valor_parcela * total_parcelas(parcela_num), 2)
 
-    # Ordenar: primeiro por DATA decrescente, depois por CLIENTE ascendente
-    df_result = df_result.sort_values(by=["DATA", "CLIENTE"], ascending=[True, True]).reset_index(drop=True)
+            filial_formatada = filial_atual
+            datas.append(data_bruta)
+            cpfs.append(str(cpf_atual).strip() if cpf_atual else "")
+            clientes.append(str(cliente_atual) if cliente_atual else "")
+            filiais.append(int(filial_formatada) if filial_formatada and filial_formatada.isdigit() else None)
+            parcelas.append(str(parcela_num) if parcela_num else "")
+            valores_parcela.append(round(float(valor_parcela), 2))
+            valores_total.append(round(float(valor_total), 2))
 
-    # Converter a DATA de volta para string no formato dd/mm/yyyy
-    df_result['DATA'] = df_result['DATA'].dt.strftime('%d/%m/%Y')
+            linha_parcela += 2  # pula para próxima parcela
 
+    # ✅ Monta DataFrame final e ordena por DATA (desc) e CLIENTE (asc)
+    df_result = pd.DataFrame({
+        "DATA": datas,
+        "CPF": cpfs,
+        "CLIENTE": clientes,
+        "FILIAL": pd.array(filiais, dtype="Int64"),
+        "PARCELA": parcelas,
+        "VALOR PARCELA": valores_parcela,
+        "VALOR TOTAL": valores_total,
+    })
+
+    # Converter a coluna DATA para datetime para ordenar corretamente: uma única
+    # chamada (com cache) para datas do Excel e textos dd/mm/aaaa
+    df_result['DATA'] = pd.to_datetime(df_result['DATA'], dayfirst=True, format='mixed', errors='coerce', cache=True)
+
+    # Ordenar: primeiro por DATA, depois por CLIENTE (ambos ascendentes), com um único
+    # lexsort estável sobre as chaves já extraídas; datas vazias (NaT) vão para o fim
+    # como no sort_values
+    datas_i8 = df_result['DATA'].to_numpy().view('i8')
+    datas_i8 = np.where(df_result['DATA'].isna().to_numpy(), np.iinfo(np.int64).max, datas_i8)
+    ordem = np.lexsort((df_result['CLIENTE'].to_numpy(), datas_i8))
+    df_result = df_result.iloc[ordem].reset_index(drop=True)
+
+    # DATA segue como datetime64; só é formatada dd/mm/yyyy no envio para a planilha
     return df_result
 
 
 # -------------------------------------------------
 # Google Sheets update
 # -------------------------------------------------
-def update_worksheet(df: pd.DataFrame, sheet_id: str, worksheet_name: str, client: gspread.Client):
-    sh = client.open_by_key(sheet_id)
-
-    try:
-        ws = sh.worksheet(worksheet_name)
-    except gspread.WorksheetNotFound:
-        ws = sh.add_worksheet(title=worksheet_name, rows=1000, cols=max(1, len(df.columns)))
-        logging.info(f"Worksheet '{worksheet_name}' created.")
-
-    existing_values = ws.get_all_values()
-    next_row = len(existing_values) + 1
-
-    # Converte DATA para datetime garantindo que são objetos de data
-    df['DATA'] = pd.to_datetime(df['DATA'], errors='coerce', dayfirst=True)
-    df['DATA'] = df['DATA'].apply(lambda x: x.strftime('%d/%m/%Y') if pd.notnull(x) else "")
-
-    # Create a copy to avoid modifying the original dataframe
-    df_formatted = df.copy()
-    
-    # Apply currency formatting to VALOR PARCELA and VALOR TOTAL
-    df_formatted['VALOR PARCELA'] = df_formatted['VALOR PARCELA'].apply(format_as_currency)
-    df_formatted['VALOR TOTAL'] = df_formatted['VALOR TOTAL'].apply(format_as_currency)
-
-    # Monta a lista mantendo os tipos corretos
-    data = []
-    for row in df_formatted.to_dict('records'):
-        data.append([
-            row['DATA'],
-            row['CPF'],
-            row['CLIENTE'],
-            row['FILIAL'] if row['FILIAL'] is not None else "",
-            row['PARCELA'],
-            row['VALOR PARCELA'],  # Now this will be formatted as currency string
-            row['VALOR TOTAL']      # Now this will be formatted as currency string
-        ])
-
-    ws.update(f'A{next_row}', data, value_input_option='USER_ENTERED')
-    logging.info(f"Updated '{worksheet_name}' with {len(df)} rows.")
-
-
 def update_google_sheet(df: pd.DataFrame, sheet_id: str):
     """Authorize and update the Google Sheet."""
-    logging.info("Loading Google credentials...")
+    # DATA chega como datetime64 de clean_transfer_file: formata uma única vez
+    # (strftime vetorizado; NaT vira "")
+    df['DATA'] = df['DATA'].dt.strftime('%d/%m/%Y').fillna("")
 
-    creds_env = os.getenv("GSERVICE_JSON")
-    scope = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ]
-
-    if creds_env:
-        creds = Credentials.from_service_account_info(json.loads(creds_env), scopes=scope)
-    else:
-        creds = Credentials.from_service_account_file("notas-transf.json", scopes=scope)
-
-    client = gspread.authorize(creds)
-
-    update_worksheet(df, sheet_id, "dados_trier_sind", client)
+    append_dataframe(df, sheet_id, "dados_trier_sind")
 
 
 # -------------------------------------------------
@@ -254,14 +216,18 @@ def main():
 
     logging.info(f"Found {len(all_files)} file(s) to process.")
 
+    # Each file is parsed independently, so spread them over worker processes
+    # (Excel parsing is CPU-bound and holds the GIL); results keep the file order
     dfs = []
-    for f in all_files:
-        try:
-            cleaned = clean_transfer_file(f)
-            if len(cleaned) > 0:
-                dfs.append(cleaned)
-        except Exception as e:
-            logging.exception(f"Failed processing {os.path.basename(f)}: {e}")
+    with ProcessPoolExecutor(max_workers=min(8, len(all_files))) as executor:
+        futures = [(f, executor.submit(clean_transfer_file, f)) for f in all_files]
+        for f, future in futures:
+            try:
+                cleaned = future.result()
+                if len(cleaned) > 0:
+                    dfs.append(cleaned)
+            except Exception as e:
+                logging.exception(f"Failed processing {os.path.basename(f)}: {e}")
 
     if not dfs:
         logging.warning("No dataframes produced after cleaning. Nothing to upload.")
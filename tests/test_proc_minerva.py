@@ -0,0 +1,33 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("gspread")
+pytest.importorskip("google.oauth2.service_account")
+pytest.importorskip("googleapiclient")
+openpyxl = pytest.importorskip("openpyxl")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts", "minerva"))
+
+
+@pytest.mark.parametrize("module", ["proc_minerva_sg", "proc_minerva_alegrete"])
+def test_numeric_cpf_column_with_blank_row(tmp_path, module):
+    """A numeric CPF column with a blank cell must not come out as "...-000"."""
+    proc = importlib.import_module(module)
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(["Nome", "CPF", "Valor"])
+    ws.append(["ANA", 98765432100, 10.5])
+    ws.append(["BIA", None, 20.0])
+    ws.append(["CAIO", 1234567890, 30.0])
+    path = tmp_path / "minerva.xlsx"
+    wb.save(path)
+
+    df = proc.clean_transfer_file(str(path))
+
+    assert df["CPF"].iloc[0] == "987.654.321-00"
+    assert df["CPF"].isna().iloc[1]
+    assert df["CPF"].iloc[2] == "012.345.678-90"
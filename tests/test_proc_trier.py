@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("gspread")
+pytest.importorskip("google.oauth2.service_account")
+pytest.importorskip("googleapiclient")
+pytest.importorskip("python_calamine")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts", "sindsaude"))
+
+import proc_trier  # noqa: E402
+
+
+def test_read_report_falls_back_when_calamine_rejects_the_file(tmp_path, monkeypatch):
+    """A non-xlsx .xls (HTML export) makes calamine raise CalamineError; the default engine must still be tried."""
+    path = tmp_path / "trier.xls"
+    path.write_text("<html><body><table><tr><td>Filial:</td></tr></table></body></html>")
+
+    real_read_excel = proc_trier.pd.read_excel
+    engines = []
+    fallback = proc_trier.pd.DataFrame({0: ["Filial:"]})
+
+    def read_excel(io, *args, engine=None, **kwargs):
+        engines.append(engine)
+        if engine == "calamine":
+            return real_read_excel(io, *args, engine=engine, **kwargs)
+        return fallback
+
+    monkeypatch.setattr(proc_trier.pd, "read_excel", read_excel)
+
+    assert proc_trier.read_report(str(path)) is fallback
+    assert engines == ["calamine", None]
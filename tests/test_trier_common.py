@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pyarrow")
+pytest.importorskip("pandas")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts", "minerva"))
+
+from _trier_common import format_ptbr  # noqa: E402
+
+
+def ptbr(x):
+    return f"{x:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def test_format_ptbr_matches_fstring_on_half_cents():
+    """Half cents must round exactly like f"{x:,.2f}" (2.675 -> "2,67", 0.125 -> "0,12")."""
+    values = np.concatenate([
+        (np.arange(-20000, 20000) + 0.5) / 100,
+        np.round(np.random.default_rng(0).uniform(-1e6, 1e6, 20000), 3),
+        [0.125, 0.375, 2.675, 1.005, 1234567.885, -0.001, 0.0],
+    ])
+    got = list(format_ptbr(values))
+    assert got == [ptbr(x) for x in values]
+
+
+def test_format_ptbr_blanks_nan():
+    assert list(format_ptbr([1234.5, np.nan])) == ["1.234,50", ""]
+
+
+def test_read_report_falls_back_when_calamine_rejects_the_file(tmp_path, monkeypatch):
+    """A non-xlsx .xls (HTML export) makes calamine raise CalamineError; xlrd must still be tried."""
+    pytest.importorskip("python_calamine")
+    import pandas as pd
+    import _trier_common
+
+    path = tmp_path / "trier.xls"
+    path.write_text("<html><body><table><tr><td>Filial:</td></tr></table></body></html>")
+
+    real_read_excel = pd.read_excel
+    engines = []
+    fallback = pd.DataFrame({"a": [1]})
+
+    def read_excel(io, *args, engine=None, **kwargs):
+        engines.append(engine)
+        if engine == "calamine":
+            return real_read_excel(io, *args, engine=engine, **kwargs)
+        return fallback
+
+    monkeypatch.setattr(_trier_common.pd, "read_excel", read_excel)
+
+    assert _trier_common.read_report(str(path)) is fallback
+    assert engines == ["calamine", "xlrd"]